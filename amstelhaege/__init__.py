@@ -4,6 +4,7 @@ This file uses check50 to check the output of an AmstelHaege solution. It
 does so by doing the following tests in this order:
     - Check if output.csv exits
     - Check if the file has valid values and is structured correctly
+    - Check if the water is placed as in one of the neighbourhoods
     - Check if the structures are placed without violating a constraint
     - Check if the total networth is computed correctly
 
@@ -12,18 +13,35 @@ does so by doing the following tests in this order:
 """
 
 import check50
-from shapely.geometry import Polygon, MultiPolygon
-import pandas as pd
-import numpy as np
+import hashlib
 import math
 import os
 import re
+from functools import lru_cache
 
 
 # Define common used variables.
 TYPES = ["WATER", "EENGEZINSWONING", "BUNGALOW", "MAISON"]
 CORNER_LABELS = [f"corner_{x}" for x in range(1, 5)]
 
+# Dimensions of the map in meters.
+MAP_WIDTH = 180
+MAP_HEIGHT = 160
+
+# Engine that computes the free meters around the houses. Either "shapely",
+# which computes the polygon distances between all pairs of houses, "raster",
+# which finds the neighbours of every house with a distance transform on a
+# grid with RASTER_RESOLUTION points per meter, or "tiles", which splits the
+# map into tiles of TILE_SIZE meters that are computed by TILE_WORKERS
+# processes against the houses within TILE_HALO meters of the tile. The
+# raster engine needs scipy and the tiles engine Shapely 2, without which
+# the shapely engine is used.
+FREE_SPACE_ENGINE = "shapely"
+RASTER_RESOLUTION = 1
+TILE_SIZE = 60
+TILE_HALO = 20
+TILE_WORKERS = None
+
 
 @check50.check()
 def exists():
@@ -35,6 +53,10 @@ def exists():
 @check50.check(exists)
 def check_file():
     """Check if the structure and values of output.csv are correct."""
+    import pandas as pd
+    import numpy as np
+    from shapely.geometry import Polygon
+
     # Check if output.csv has content.
     if os.stat("output.csv").st_size == 0:
         raise check50.Failure("Output.csv may not be empty. Provide at least "
@@ -148,9 +170,124 @@ def check_file():
             raise check50.Failure(error)
 
 
+@check50.check(check_file)
+def check_water():
+    """Check if the water is placed as in one of the neighbourhoods."""
+    import pandas as pd
+    import numpy as np
+
+    with open("output.csv") as csvfile:
+        df = pd.read_csv(csvfile)
+
+    water = df[:-1][df["type"][:-1] == "WATER"]
+    corners = np.array([[c.split(",") for c in row]
+                        for row in water[CORNER_LABELS].values],
+                       dtype=np.float64).reshape(-1, 4, 2)
+    rects, rectangles = water_rectangles(corners)
+    canon, key = water_key(rects)
+    registry = neighbourhoods()
+
+    # Find the neighbourhood by the hash of the water and make sure the
+    # rectangles are the same.
+    if key in registry and rectangles.all():
+        name, ref = registry[key]
+
+        if np.array_equal(canon, ref):
+            check50.log(f"water is placed as in {name}")
+            return
+
+    # Report the water that is not in the neighbourhood it matches most.
+    name, ref = max(registry.values(), key=lambda n: (
+        (rects[:, None] == n[1][None]).all(axis=2).any(axis=1) & rectangles
+    ).sum())
+    found = (rects[:, None] == ref[None]).all(axis=2) & rectangles[:, None]
+    error = f"Expected the water to be placed as in one of the " \
+            f"neighbourhoods, but it matches {name} best and found:\n"
+
+    for idx in water.index[~found.any(axis=1)]:
+        error = "".join([error, f"\t'{df['structure'][idx]}' \tis not water "
+                                f"of {name} on row {idx + 2}\n"])
+
+    missing = (~found.any(axis=0)).sum()
+    if missing:
+        error = "".join([error, f"\t{missing} water structure(s) of {name} "
+                                f"missing\n"])
+
+    raise check50.Failure(error)
+
+
+def water_rectangles(corners):
+    """
+    Compute the (min x, min y, max x, max y) bounds of an (n, 4, 2) array with
+    the corners of the water structures. Also marks which of them are axis
+    aligned rectangles, which is when the area of the corners is the area of
+    their bounds.
+    """
+    import numpy as np
+
+    rects = np.hstack([corners.min(axis=1), corners.max(axis=1)])
+    x, y = corners[..., 0], corners[..., 1]
+    areas = np.abs(np.sum(x * np.roll(y, -1, axis=1) -
+                          np.roll(x, -1, axis=1) * y, axis=1)) / 2
+
+    return rects, np.isclose(areas, np.prod(rects[:, 2:] - rects[:, :2],
+                                            axis=1))
+
+
+def water_key(rects):
+    """
+    Sort an (n, 4) array of water rectangles in a canonical order and return
+    it together with the sha256 hex digest of the sorted rectangles.
+    """
+    import numpy as np
+
+    # Adding zero turns -0.0 into 0.0, which has different bytes.
+    rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4) + 0.0
+    rects = rects[np.lexsort(rects.T[::-1])]
+
+    return rects, hashlib.sha256(rects.tobytes()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def neighbourhoods():
+    """
+    Read the water of the neighbourhoods in the neighbourhoods folder. The
+    files give the bottom left and top right corner of every rectangle, in
+    a map that is either MAP_WIDTH wide or MAP_HEIGHT wide. All files are in
+    the same orientation, so they are all turned to the orientation of the
+    map if any of them does not fit in it. Returns the name and canonical
+    rectangles of every neighbourhood by the hash of its water.
+    """
+    import pandas as pd
+    import numpy as np
+
+    water = {}
+
+    for filename in sorted(os.listdir("neighbourhoods")):
+        df = pd.read_csv(os.path.join("neighbourhoods", filename))
+        water[os.path.splitext(filename)[0]] = np.array(
+            [c.split(",") for c in df[df["type"] == "WATER"][
+                ["bottom_left_xy", "top_right_xy"]].values.ravel()],
+            dtype=np.float64).reshape(-1, 4)
+
+    turn = any(rects[:, 2].max() > MAP_WIDTH or
+               rects[:, 3].max() > MAP_HEIGHT for rects in water.values())
+    registry = {}
+
+    for name, rects in water.items():
+        canon, key = water_key(rects[:, [1, 0, 3, 2]] if turn else rects)
+        registry[key] = (name, canon)
+
+    return registry
+
+
 @check50.check(check_file)
 def check_placement():
     """Check if all objects are placed correctly."""
+    import pandas as pd
+    import numpy as np
+    from shapely.geometry import MultiPolygon, Polygon
+
     with open("output.csv") as csvfile:
         df = pd.read_csv(csvfile)
 
@@ -183,28 +320,31 @@ def check_placement():
 
             raise check50.Failure(error)
 
-        # Check if the area of the total map is 180x160.
-        polys = list(ps_water.values())
-        polys.extend(list(ps_houses.values()))
-        bounds = MultiPolygon(polys).bounds
-        x_dim = bounds[2] - bounds[0]
-        y_dim = bounds[3] - bounds[1]
+        # Check if all structures are placed within the map.
+        names = list(ps_water) + list(ps_houses)
+        bounds = np.array([p.bounds for p in ps_water.values()] +
+                          [p.bounds for p in ps_houses.values()],
+                          dtype=float).reshape(-1, 4)
+        outside = [df[df["structure"] == names[k]].index.tolist()[0]
+                   for k in np.nonzero(outside_map(bounds))[0]]
+
+        if outside:
+            error = f"Structures have to be placed within the map of " \
+                    f"{MAP_WIDTH}x{MAP_HEIGHT}, but found:\n"
+
+            for idx in sorted(outside):
+                error = "".join([error, f"\t'{df['structure'][idx]}' \tis "
+                                        f"outside of the map on row "
+                                        f"{idx + 2}\n"])
 
-        if x_dim > 180.0 or y_dim > 160.0:
-            raise check50.Failure(f"The area has a dimension of "
-                                  f"'{x_dim}x{y_dim}' and thus exceeds "
-                                  f"180x160.")
+            raise check50.Failure(error)
 
-        free_space = {}
-        house_polys = list(ps_houses.values()) # TODO: Add one big rectangle poly with hole in the middle for the map.
+        free_space = compute_free_space(ps_houses)
         min_extra_meters = [0, 2, 3, 6]
         invalid_houses = np.array([[0, 0, 0]], ndmin=2)
 
         # Check if the minimal extra meters for houses are correct.
-        for s, p in ps_houses.items():
-            other_houses = list(house_polys)
-            other_houses.remove(p)
-            free_space[s] = math.floor(p.distance(MultiPolygon(other_houses)))
+        for s in ps_houses:
             s_type = df[df["structure"] == s]["type"].values[0]
             req_space = min_extra_meters[TYPES.index(s_type)]
 
@@ -225,9 +365,257 @@ def check_placement():
             raise check50.Failure(error)
 
 
+def outside_map(bounds):
+    """
+    Mark the rectangles in an (n, 4) array of (min x, min y, max x, max y)
+    bounds that are not within the map.
+    """
+    return (bounds[:, :2] < 0).any(axis=1) | (bounds[:, 2] > MAP_WIDTH) | \
+        (bounds[:, 3] > MAP_HEIGHT)
+
+
+def edge_distances(bounds):
+    """
+    Compute the distance from every rectangle in an (n, 4) array of
+    (min x, min y, max x, max y) bounds to the edge of the map.
+    """
+    import numpy as np
+
+    return np.min([bounds[:, 0], bounds[:, 1], MAP_WIDTH - bounds[:, 2],
+                   MAP_HEIGHT - bounds[:, 3]], axis=0)
+
+
+def compute_free_space(houses):
+    """
+    Compute the free meters around every house, which is the distance to the
+    closest other house or to the edge of the map, rounded down. Distances
+    between houses are computed with the engine that is selected by
+    FREE_SPACE_ENGINE.
+    """
+    import numpy as np
+
+    free_space = None
+
+    if FREE_SPACE_ENGINE == "raster" and len(houses) > 1:
+        try:
+            free_space = raster_free_space(houses)
+        except ImportError:
+            check50.log("raster engine needs scipy, using shapely instead")
+
+    if FREE_SPACE_ENGINE == "tiles" and len(houses) > 1:
+        try:
+            free_space = tiled_free_space(houses)
+        except ImportError:
+            check50.log("tiles engine needs Shapely 2, using shapely instead")
+
+    if free_space is None:
+        free_space = shapely_free_space(houses) if len(houses) > 1 else {}
+
+    # The free space of a house ends at the edge of the map.
+    edges = edge_distances(np.array([p.bounds for p in houses.values()],
+                                    dtype=float).reshape(-1, 4))
+
+    for s, edge in zip(houses, edges):
+        free_space[s] = min(free_space.get(s, math.inf), math.floor(edge))
+
+    return free_space
+
+
+def shapely_free_space(houses):
+    """Compute the free meters of every house from its polygon distances."""
+    from shapely.geometry import MultiPolygon
+
+    free_space = {}
+    house_polys = list(houses.values())
+
+    for s, p in houses.items():
+        other_houses = list(house_polys)
+        other_houses.remove(p)
+        free_space[s] = math.floor(p.distance(MultiPolygon(other_houses)))
+
+    return free_space
+
+
+def raster_free_space(houses):
+    """
+    Compute the free meters of every house with a distance transform, in time
+    that depends on the area of the map instead of the number of houses
+    squared. All houses are drawn as the grid points they cover, after which
+    a single Euclidean distance transform finds the nearest house of every
+    grid point. Two houses whose regions of nearest grid points touch are
+    neighbours, and the closest other house is always a neighbour. The free
+    space of a house is then the distance to its closest neighbour.
+
+    Returns None if a house is not an axis aligned rectangle or overlaps
+    other houses on the grid, since the raster can not represent those.
+    """
+    import numpy as np
+    from scipy import ndimage
+
+    names = list(houses)
+    bounds = np.array([houses[s].bounds for s in names])
+    areas = np.array([houses[s].area for s in names])
+
+    if not np.allclose(areas, (bounds[:, 2] - bounds[:, 0]) *
+                       (bounds[:, 3] - bounds[:, 1])):
+        return None
+
+    # Draw every house as the grid points it covers, labelled from 1.
+    corners = bounds * RASTER_RESOLUTION
+    low = np.floor(corners[:, :2].min(axis=0))
+    starts = (np.floor(corners[:, :2]) - low).astype(np.int64)
+    ends = (np.ceil(corners[:, 2:]) - low).astype(np.int64) + 1
+    labels = np.zeros(ends.max(axis=0), dtype=np.int32)
+
+    for k, ((x0, y0), (x1, y1)) in enumerate(zip(starts, ends)):
+        labels[x0:x1, y0:y1] = k + 1
+
+    # Houses that overlap draw over each other's grid points, which hides
+    # their closest neighbours. Those are left to the Shapely engine.
+    counts = np.bincount(labels.ravel(), minlength=len(names) + 1)[1:]
+
+    if (counts < (ends - starts).prod(axis=1)).any():
+        return None
+
+    # Label every grid point with its nearest house and collect the pairs of
+    # houses that are nearest to neighbouring grid points.
+    indices = ndimage.distance_transform_edt(labels == 0,
+                                             return_distances=False,
+                                             return_indices=True)
+    nearest = labels[tuple(indices)]
+    pairs = []
+
+    for a, b in [(nearest[1:], nearest[:-1]),
+                 (nearest[:, 1:], nearest[:, :-1]),
+                 (nearest[1:, 1:], nearest[:-1, :-1]),
+                 (nearest[1:, :-1], nearest[:-1, 1:])]:
+        border = a != b
+        pairs.append(np.column_stack([a[border], b[border]]))
+
+    pairs = np.unique(np.sort(np.concatenate(pairs), axis=1), axis=0) - 1
+
+    # Compute the distance between the polygons of every pair with Shapely,
+    # so the distances are rounded in the same way as by the Shapely engine.
+    dists = [houses[names[i]].distance(houses[names[j]]) for i, j in pairs]
+    space = np.full(len(names), np.inf)
+    np.minimum.at(space, pairs[:, 0], dists)
+    np.minimum.at(space, pairs[:, 1], dists)
+
+    return {s: math.floor(d) for s, d in zip(names, space)}
+
+
+def tiled_free_space(houses):
+    """
+    Compute the free meters of every house in TILE_WORKERS processes. Every
+    house belongs to the tile of TILE_SIZE meters that holds its center, and
+    is compared with the houses whose bounds are within TILE_HALO meters of
+    the houses of its tile. The corners of the houses and the distances are
+    kept in shared memory, so the workers build the polygons of their tiles
+    themselves and no geometry is pickled.
+
+    A house without another house within TILE_HALO meters is compared with
+    all houses afterwards, so the result is the same as that of the Shapely
+    engine for any tiling.
+
+    Returns None if the houses do not all have the same number of corners.
+    """
+    import multiprocessing
+    import numpy as np
+    from multiprocessing import shared_memory
+    from shapely import distance, polygons
+
+    names = list(houses)
+    coords = [np.asarray(houses[s].exterior.coords) for s in names]
+
+    if len({len(c) for c in coords}) != 1:
+        return None
+
+    coords = np.array(coords)
+    bounds = np.hstack([coords.min(axis=1), coords.max(axis=1)])
+
+    # Group the houses by the tile that holds their center and find the
+    # houses near every tile.
+    centers = (bounds[:, :2] + bounds[:, 2:]) / 2
+    _, tile_ids = np.unique(np.floor(centers / TILE_SIZE), axis=0,
+                            return_inverse=True)
+    tile_ids = tile_ids.ravel()
+    tiles = []
+
+    for owned in np.split(np.argsort(tile_ids, kind="stable"),
+                          np.cumsum(np.bincount(tile_ids))[:-1]):
+        low = bounds[owned, :2].min(axis=0) - TILE_HALO
+        high = bounds[owned, 2:].max(axis=0) + TILE_HALO
+        near = np.nonzero((bounds[:, :2] <= high).all(axis=1) &
+                          (bounds[:, 2:] >= low).all(axis=1))[0]
+        tiles.append((owned, near))
+
+    # Forked workers share the memory with this process, in which each of
+    # them writes the distances of the houses of its own tiles.
+    workers = min(TILE_WORKERS or os.cpu_count(), len(tiles))
+    shm = shared_memory.SharedMemory(create=True,
+                                     size=coords.nbytes + 8 * len(names))
+
+    try:
+        corners = np.ndarray(coords.shape, np.float64, shm.buf)
+        corners[:] = coords
+        dists = np.ndarray(len(names), np.float64, shm.buf,
+                           offset=coords.nbytes)
+
+        if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            procs = [context.Process(target=tile_free_space, args=(
+                corners, dists, tiles[k::workers])) for k in range(workers)]
+
+            for proc in procs:
+                proc.start()
+
+            for proc in procs:
+                proc.join()
+
+            if any(proc.exitcode for proc in procs):
+                raise RuntimeError("a worker of the tiles engine failed")
+        else:
+            tile_free_space(corners, dists, tiles)
+
+        space = dists.copy()
+    finally:
+        # The views have to be gone before the memory can be closed.
+        corners = dists = None
+        shm.close()
+        shm.unlink()
+
+    # Compare the houses without a house in their halo with all houses.
+    polys = polygons(coords)
+
+    for k in np.nonzero(space > TILE_HALO)[0]:
+        dists = distance(polys[k], polys)
+        dists[k] = np.inf
+        space[k] = dists.min()
+
+    return {s: math.floor(d) for s, d in zip(names, space)}
+
+
+def tile_free_space(corners, space, tiles):
+    """
+    Write the distance from every house of the given tiles to the closest
+    house near its tile into space, or infinity if there is none.
+    """
+    import numpy as np
+    from shapely import distance, polygons
+
+    for owned, near in tiles:
+        dists = distance(polygons(corners[owned])[:, None],
+                         polygons(corners[near])[None, :])
+        dists[owned[:, None] == near[None, :]] = np.inf
+        space[owned] = dists.min(axis=1)
+
+
 @check50.check(check_placement)
 def check_score():
     """Check if solution produces networth specified in output.csv."""
+    import pandas as pd
+    from shapely.geometry import Polygon
+
     with open("output.csv") as csvfile:
         df = pd.read_csv(csvfile)
 
@@ -239,13 +627,7 @@ def check_score():
             ps_houses[row[0]] = p
 
         # Compute the free meters per house.
-        free_space = {}
-        house_polys = list(ps_houses.values())
-
-        for s, p in ps_houses.items():
-            other_houses = list(house_polys)
-            other_houses.remove(p)
-            free_space[s] = math.floor(p.distance(MultiPolygon(other_houses)))
+        free_space = compute_free_space(ps_houses)
 
         # Fetch structures per type and compute networths to make up the total
         # networth.
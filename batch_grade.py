@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Grade many submissions of one case at once. The checks of the case are
+imported once per worker process and run on every submission found in a
+directory tree, without starting check50 for each of them. The result of
+every submission is written as one JSON line.
+
+Usage: python batch_grade.py <case> <submissions> [-o results.jsonl] [-j 8]
+
+Here <case> is the folder of the checks, like `smartgrid` or
+`railnl/holland`, and <submissions> a folder that contains an `output.csv`
+or `output.json` somewhere in a sub-folder per submission.
+"""
+
+import argparse
+import inspect
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import check50
+from check50 import internal, runner
+
+
+# Files of the case folder that are not copied into the working directory.
+SKIP_FILES = {"__init__.py", ".cs50.yaml", "__pycache__"}
+
+# Version of check50 whose private parts are used to find the checks of a case
+# and their logs, since check50 has no public API for either.
+CHECK50_VERSION = "3.5.0"
+
+# Checks and working directory of the current worker process.
+CHECKS = []
+WORK_DIR = None
+
+
+def required_file(case_dir):
+    """Return the name of the output file that is required by a case."""
+    with open(case_dir / ".cs50.yaml") as configfile:
+        match = re.search(r'!require\s+"([^"]+)"', configfile.read())
+
+    return match[1] if match else "output.csv"
+
+
+def private(obj, name):
+    """
+    Return a private attribute of check50, or exit with a message if this
+    version of check50 does not have it.
+    """
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        sys.exit(f"batch_grade.py needs {name} of check50, which check50 "
+                 f"{check50.__version__} does not have. Install check50 "
+                 f"{CHECK50_VERSION} to use it.")
+
+
+def check_log():
+    """Return the list to which check50.log adds the lines of a check."""
+    return private(private(check50, "_api"), "_log")
+
+
+def load_checks(case_dir):
+    """
+    Import the checks of a case and return them in the order in which they
+    are declared, as (name, function, dependency) tuples. The check50
+    `exists` check is skipped, since the batch grader looks up the output
+    files itself.
+    """
+    check_names = private(runner, "_check_names")
+    internal.check_dir = case_dir
+    check_names.clear()
+    module = internal.import_file("checks", case_dir / "__init__.py")
+    checks = []
+
+    for name in check_names:
+        check = getattr(module, name)
+        dependency = private(check, "_check_dependency")
+
+        if name != "exists":
+            checks.append((name, check.__wrapped__,
+                           dependency.__name__ if dependency else None))
+
+    return checks
+
+
+def init_worker(case_dir, filename, tmp_dir):
+    """
+    Import the checks once and set up a working directory to which the
+    reference data of the case is copied, like check50.include does. Files
+    that the checks write there, like cached bounds, stay out of the case.
+    """
+    global CHECKS, WORK_DIR
+    CHECKS = load_checks(case_dir)
+    WORK_DIR = Path(tempfile.mkdtemp(dir=tmp_dir))
+
+    for path in case_dir.iterdir():
+        if path.name in SKIP_FILES or path.name == filename:
+            continue
+
+        if path.is_dir():
+            shutil.copytree(path, WORK_DIR / path.name)
+        else:
+            shutil.copy2(path, WORK_DIR / path.name)
+
+    os.chdir(WORK_DIR)
+
+
+def grade(submission):
+    """
+    Run all checks on a submission and return the results per check. A check
+    is only run if its dependency passed, with the state it returned.
+    """
+    shutil.copyfile(submission, WORK_DIR / submission.name)
+    log = check_log()
+    states = {None: None, "exists": None}
+    results = []
+
+    for name, check, dependency in CHECKS:
+        result = {"name": name, "passed": None, "log": []}
+        results.append(result)
+
+        if dependency not in states:
+            result["cause"] = "can't check until a frown turns upside down"
+            continue
+
+        log.clear()
+
+        try:
+            args = (states[dependency],) if \
+                inspect.getfullargspec(check).args else ()
+            states[name] = check(*args)
+            result["passed"] = True
+        except check50.Failure as e:
+            result["passed"] = False
+            result["cause"] = e.payload["rationale"]
+        except Exception as e:
+            result["cause"] = f"{type(e).__name__}: {e}"
+
+        result["log"] = list(log)
+
+    os.remove(WORK_DIR / submission.name)
+
+    return {"submission": str(submission),
+            "passed": all(r["passed"] for r in results),
+            "checks": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("case", type=Path, help="folder with the checks")
+    parser.add_argument("submissions", type=Path,
+                        help="folder to search for output files")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write the JSON lines to")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    case_dir = args.case.resolve()
+    filename = required_file(case_dir)
+
+    # Find the private parts of check50 before starting the workers, so a
+    # missing one is reported once instead of breaking every worker.
+    check_log()
+
+    if not load_checks(case_dir):
+        sys.exit(f"Found no checks in {case_dir} with check50 "
+                 f"{check50.__version__}. Install check50 {CHECK50_VERSION} "
+                 f"to use batch_grade.py.")
+
+    submissions = sorted(p.resolve() for p in args.submissions.rglob(filename))
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    with tempfile.TemporaryDirectory(prefix="batch_grade_") as tmp_dir, \
+            ProcessPoolExecutor(max_workers=args.jobs,
+                                initializer=init_worker,
+                                initargs=(case_dir, filename, tmp_dir)) \
+            as executor:
+        chunksize = max(1, len(submissions) // (4 * args.jobs))
+
+        for result in executor.map(grade, submissions, chunksize=chunksize):
+            out.write(json.dumps(result) + "\n")
+
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Benchmark the checks of every case on synthetic outputs of growing size. For
+every case there is a generator that writes a valid output, or an invalid one
+with a single violation near the end of the file, together with the reference
+data it needs. The checks are then timed one by one, like check50 would run
+them, and the fastest time of a few runs is reported per check.
+
+Usage: python benchmark.py [case ...] [-s 100 1000] [-r 3] [-o results.json]
+
+The size means the number of houses for AmstelHaege and SmartGrid, aminos
+for Protein Powder, tracks for RailNL, moves for Rush Hour, nets for Chips &
+Circuits and regions for Radio Russia.
+"""
+
+import argparse
+import csv
+import importlib
+import inspect
+import io
+import json
+import math
+import os
+import platform
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import check50
+
+from batch_grade import SKIP_FILES, load_checks, required_file
+
+
+ROOT = Path(__file__).resolve().parent
+
+# Modules that are imported before the checks are timed.
+PRELOAD = ["numpy", "pandas", "shapely.geometry"]
+
+
+def write_csv(rows):
+    """Format rows as the text of a csv file."""
+    text = io.StringIO()
+    csv.writer(text, lineterminator="\n").writerows(rows)
+
+    return text.getvalue()
+
+
+def amstelhaege(size, valid, rng):
+    """
+    Place houses in five rows of cells of 24 by 24 meters above the water of
+    the first neighbourhood, with some space to the edges of the map. The
+    number of houses is rounded up to a multiple of 20 to get the required
+    percentages of house types, and the map grows in width with them, so the
+    neighbourhood keeps its orientation. The invalid map moves the last house
+    to one meter from the house below it.
+    """
+    n = max(20, -(-size // 20) * 20)
+    types = (["EENGEZINSWONING"] * 12 + ["BUNGALOW"] * 5 + ["MAISON"] * 3) \
+        * (n // 20)
+    rng.shuffle(types)
+    dims = {"EENGEZINSWONING": (8, 8), "BUNGALOW": (11, 7),
+            "MAISON": (12, 10)}
+    cols = -(-n // 5)
+    width = max(180, 12 + 24 * cols)
+    height = 160
+    rects = []
+
+    for k, s_type in enumerate(types):
+        x, y = 12 + 24 * (k % cols), 44 + 24 * (k // cols)
+        w, h = dims[s_type]
+        rects.append([x, y, x + w, y + h])
+
+    if not valid:
+        below = rects[-1 - cols]
+        w, h = dims[types[-1]]
+        rects[-1] = [below[0], below[3] + 1, below[0] + w, below[3] + 1 + h]
+
+    # Compute the free meters of every house from the houses around it and
+    # the edges of the map.
+    cells = {(k % cols, k // cols): rect for k, rect in enumerate(rects)}
+    base_worths = {"EENGEZINSWONING": 2850, "BUNGALOW": 3990, "MAISON": 6100}
+    perc_incr = {"EENGEZINSWONING": 3, "BUNGALOW": 4, "MAISON": 6}
+    networth = 0
+
+    for k, (s_type, a) in enumerate(zip(types, rects)):
+        free = min(a[0], a[1], width - a[2], height - a[3])
+
+        for dx in [-1, 0, 1]:
+            for dy in [-1, 0, 1]:
+                b = cells.get((k % cols + dx, k // cols + dy))
+
+                if b is not None and b is not a:
+                    free = min(free, math.hypot(
+                        max(0, b[0] - a[2], a[0] - b[2]),
+                        max(0, b[1] - a[3], a[1] - b[3])))
+
+        networth += base_worths[s_type] * (100 + perc_incr[s_type]
+                                           * math.floor(free))
+
+    rows_out = [["structure", "corner_1", "corner_2", "corner_3", "corner_4",
+                 "type"],
+                ["water_1", "0,0", "180,0", "180,32", "0,32", "WATER"]]
+
+    for k, (s_type, (x1, y1, x2, y2)) in enumerate(zip(types, rects)):
+        rows_out.append([f"{s_type.lower()}_{k + 1}", f"{x1},{y1}",
+                         f"{x2},{y1}", f"{x2},{y2}", f"{x1},{y2}", s_type])
+
+    rows_out.append(["networth", networth, "", "", "", ""])
+
+    return {"output.csv": write_csv(rows_out)}, \
+        {"MAP_WIDTH": width, "MAP_HEIGHT": height}
+
+
+def protein_powder(size, valid, rng):
+    """
+    Fold a random protein of the given length as a 2D snake. The invalid fold
+    turns back onto itself at the end.
+    """
+    n = max(4, size)
+    aminos = rng.choices("HPC", weights=[4, 4, 1], k=n)
+    width = math.ceil(math.sqrt(n))
+    folds = []
+
+    for i in range(n - 1):
+        row, col = divmod(i, width)
+
+        if col == width - 1:
+            folds.append(2)
+        else:
+            folds.append(1 if row % 2 == 0 else -1)
+
+    folds.append(0)
+
+    if not valid:
+        folds[-3] = -folds[-4]
+
+    # Compute the score over all neighbouring pairs that are not linked.
+    pos = [0, 0]
+    index = {}
+
+    for i, fold in enumerate(folds):
+        index.setdefault(tuple(pos), i)
+
+        if fold:
+            pos[abs(fold) - 1] += fold // abs(fold)
+
+    bonds = {"HH": -1, "HC": -1, "CH": -1, "CC": -5}
+    score = 0
+
+    for (x, y), i in index.items():
+        for j in [index.get((x + 1, y)), index.get((x, y + 1))]:
+            if j is not None and abs(i - j) > 1:
+                score += bonds.get(aminos[i] + aminos[j], 0)
+
+    rows = [["amino", "fold"]] + [list(row) for row in zip(aminos, folds)]
+
+    return {"output.csv": write_csv(rows + [["score", score]])}, {}
+
+
+def railnl(size, valid, rng):
+    """
+    Run the given number of trains over random walks of 20 connections on a
+    grid of stations, with enough stations to use about half of them. The
+    invalid output lets the last train jump to a station two stops away.
+    """
+    width = max(3, math.ceil(math.sqrt(20 * size)))
+    names = [f"Station {i}" for i in range(width * width)]
+    distances = {}
+    neighbours = [[] for _ in names]
+
+    for i in range(width * width):
+        for j in [i + 1, i + width]:
+            if j < width * width and (j == i + width or j % width):
+                distances[i, j] = distances[j, i] = rng.randint(5, 30)
+                neighbours[i].append(j)
+                neighbours[j].append(i)
+
+    tracks = []
+
+    for _ in range(size):
+        track = [rng.randrange(width * width)]
+
+        while len(track) < 21:
+            track.append(rng.choice(neighbours[track[-1]]))
+
+        tracks.append(track)
+
+    if not valid:
+        i = tracks[-1][-2]
+        tracks[-1][-1] = i + 2 if i % width < width - 2 else i - 2
+
+    used = {frozenset(con) for track in tracks
+            for con in zip(track[:-1], track[1:])}
+    tot_time = sum(distances.get(con, 0) for track in tracks
+                   for con in zip(track[:-1], track[1:]))
+    score = len(used) / (len(distances) // 2) * 10000 - (len(tracks) * 100
+                                                          + tot_time)
+
+    stations = [["station", "x", "y"]] + \
+        [[name, float(i % width), float(i // width)]
+         for i, name in enumerate(names)]
+    connections = [["station1", "station2", "distance"]] + \
+        [[names[i], names[j], d] for (i, j), d in distances.items() if i < j]
+    rows = [["train", "stations"]] + \
+        [[f"train_{k + 1}", "[" + ", ".join(names[i] for i in track) + "]"]
+         for k, track in enumerate(tracks)] + [["score", repr(score)]]
+
+    return {"output.csv": write_csv(rows),
+            "data/stations.csv": write_csv(stations),
+            "data/connections.csv": write_csv(connections)}, \
+        {"MAX_TRACKS": size, "MAX_TIME": 20 * 30}
+
+
+def rush_hour(size, valid, rng):
+    """
+    Move a blocking car back and forth before the red car drives to the edge
+    of a 6x6 board. The invalid output leaves the blocking car in front of the
+    red car for the last move.
+    """
+    board = [["car", "orientation", "row", "col", "length"],
+             ["X", "H", 1, 3, 2], ["A", "V", 6, 1, 2]]
+    moves = [["A", 1], ["A", -1]] * max(1, (size - 1) // 2)
+
+    if not valid:
+        moves.pop()
+
+    rows = [["car", "move"]] + moves + [["X", 4]]
+
+    return {"output.csv": write_csv(rows), "board.csv": write_csv(board)}, {}
+
+
+def smartgrid(size, valid, rng):
+    """
+    Scatter houses over a district with a battery for every 30 houses on its
+    bottom row. Every house gets a walk to the nearest battery over a shared
+    cable on the row above the batteries. The invalid output skips a cable in
+    the walk of the last house.
+    """
+    n_batteries = max(1, size // 30)
+    width = max(n_batteries, math.ceil(math.sqrt(2 * size)))
+    cells = rng.sample(range(width * width), size)
+    house_xy = [(c % width, 2 + c // width) for c in cells]
+    outputs = [round(rng.uniform(20, 80), 8) for _ in range(size)]
+    battery_xy = [((2 * k + 1) * width // (2 * n_batteries), 0)
+                  for k in range(n_batteries)]
+    batteries = [[] for _ in battery_xy]
+
+    for h, (x, y) in enumerate(house_xy):
+        b = min(range(n_batteries), key=lambda k: abs(battery_xy[k][0] - x))
+        bx = battery_xy[b][0]
+        step = 1 if bx >= x else -1
+        cables = [(x, y_) for y_ in range(y, 0, -1)] + \
+            [(x_, 1) for x_ in range(x + step, bx + step, step)] + [(bx, 0)]
+
+        if not valid and h == size - 1:
+            del cables[len(cables) // 2]
+
+        batteries[b].append((h, cables))
+
+    capacities = [round(sum(outputs[h] for h, _ in houses) + 1, 8)
+                  for houses in batteries]
+    n_cables = len({c for houses in batteries for _, cables in houses
+                    for c in cables})
+    output = [{"district": 1,
+               "costs-shared": 9 * n_cables + 5000 * n_batteries}]
+
+    for (bx, by), capacity, houses in zip(battery_xy, capacities, batteries):
+        output.append({"location": f"{bx},{by}", "capacity": capacity,
+                       "houses": [{"location": "%d,%d" % house_xy[h],
+                                   "output": outputs[h],
+                                   "cables": ["%d,%d" % c for c in cables]}
+                                  for h, cables in houses]})
+
+    houses_csv = [["x", "y", "maxoutput"]] + \
+        [[x, y, out] for (x, y), out in zip(house_xy, outputs)]
+    batteries_csv = [["positie", "capaciteit"]] + \
+        [[f"{x},{y}", capacity]
+         for (x, y), capacity in zip(battery_xy, capacities)]
+
+    return {"output.json": json.dumps(output, indent=2),
+            "data/district_1/district-1_houses.csv": write_csv(houses_csv),
+            "data/district_1/district-1_batteries.csv":
+                write_csv(batteries_csv)}, {}
+
+
+def chips_and_circuits(size, valid, rng):
+    """
+    Put the two gates of every net in a cell of 3 by 4 on the print and
+    connect them with a wire of length 4 around the cell. The invalid output
+    leaves out a step of the last wire.
+    """
+    cols = math.ceil(math.sqrt(size))
+    gates = [["chip", "x", "y"]]
+    netlist = [["chip_a", "chip_b"]]
+    rows = [["net", "wires"]]
+
+    for k in range(size):
+        x, y = 3 * (k % cols) + 1, 4 * (k // cols) + 1
+        gates.extend([[2 * k + 1, x, y], [2 * k + 2, x, y + 2]])
+        netlist.append([2 * k + 1, 2 * k + 2])
+        wire = [(x, y), (x + 1, y), (x + 1, y + 1), (x + 1, y + 2),
+                (x, y + 2)]
+
+        if not valid and k == size - 1:
+            del wire[2]
+
+        rows.append([f"({2 * k + 1},{2 * k + 2})",
+                     "[" + ",".join("(%d,%d)" % c for c in wire) + "]"])
+
+    rows.append(["chip_0_net_1", 4 * size])
+
+    return {"output.csv": write_csv(rows),
+            "data/chip_0/print_0.csv": write_csv(gates),
+            "data/chip_0/netlist_1.csv": write_csv(netlist)}, {}
+
+
+def radio_russia(size, valid, rng):
+    """
+    Lay out the regions as a grid map in which every region neighbours the
+    regions next to, above and below it, and send with a checkerboard of two
+    types. The invalid output gives the last region the type of the region
+    above it.
+    """
+    width = math.ceil(math.sqrt(size))
+    regions = [["id", "neighbours"]]
+    types = []
+
+    for i in range(size):
+        x, y = i % width, i // width
+        neighbours = [j for j, ok in [(i - 1, x > 0), (i + 1, x < width - 1),
+                                      (i - width, y > 0), (i + width, True)]
+                      if ok and 0 <= j < size]
+        regions.append([i, ",".join(map(str, neighbours))])
+        types.append("AB"[(x + y) % 2])
+
+    if not valid:
+        types[-1] = types[-1 - width]
+
+    # Pick the cheapest schema of assignment 2 for the used types.
+    schemas = [[12, 26], [19, 20], [16, 17], [3, 34]]
+    costs = [a * types.count("A") + b * types.count("B") for a, b in schemas]
+    rows = [["id", "type"]] + [[i, t] for i, t in enumerate(types)]
+    rows.append(["usa", costs.index(min(costs)) + 1])
+
+    return {"output.csv": write_csv(rows),
+            "data/gen_students_data/usa/usa_regions.csv":
+                write_csv(regions)}, {}
+
+
+# Generator, folder of the checks and default sizes per case.
+CASES = {
+    "amstelhaege": (amstelhaege, "amstelhaege", [20, 100, 200]),
+    "protein_powder": (protein_powder, "protein_powder", [100, 1000, 10000]),
+    "railnl": (railnl, "railnl/national", [10, 100, 1000]),
+    "rush_hour": (rush_hour, "rush_hour/board6x6_1", [100, 1000, 10000]),
+    "smartgrid": (smartgrid, "smartgrid", [150, 600, 2400]),
+    "chips_and_circuits": (chips_and_circuits, "chips_and_circuits",
+                           [100, 1000, 10000]),
+    "radio_russia": (radio_russia, "radio_russia", [100, 1000, 10000]),
+}
+
+
+def prepare(case_dir, files, tmp_dir):
+    """
+    Write the generated files into a new working directory and link the
+    files of the case that were not generated, like check50.include would
+    copy them.
+    """
+    work_dir = Path(tempfile.mkdtemp(dir=tmp_dir))
+
+    for name, text in files.items():
+        (work_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (work_dir / name).write_text(text)
+
+    generated = {Path(name).parts[0] for name in files}
+
+    for path in case_dir.iterdir():
+        if path.name not in SKIP_FILES | generated:
+            os.symlink(path, work_dir / path.name)
+
+    return work_dir
+
+
+def time_checks(case_dir, work_dir, overrides):
+    """
+    Import the checks of a case and run them in order in the working
+    directory, after setting the given module globals. Returns the time and
+    result of every check.
+    """
+    checks = load_checks(case_dir)
+    os.chdir(work_dir)
+
+    # The checks import their heavy dependencies themselves, which is covered
+    # by import_budget.py, so those imports are not part of the timings.
+    for module in PRELOAD:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    states = {None: None, "exists": None}
+    results = []
+
+    for name, check, dependency in checks:
+        check.__globals__.update(overrides)
+        result = {"check": name, "seconds": None, "passed": None}
+        results.append(result)
+
+        if dependency not in states:
+            continue
+
+        check50._api._log.clear()
+        args = (states[dependency],) if \
+            inspect.getfullargspec(check).args else ()
+        start = time.perf_counter()
+
+        try:
+            states[name] = check(*args)
+            result["passed"] = True
+        except check50.Failure:
+            result["passed"] = False
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+
+        result["seconds"] = time.perf_counter() - start
+
+    return results
+
+
+def benchmark(case, size, valid, repeat, seed, settings, tmp_dir):
+    """
+    Generate an output of a case and time its checks, after setting the given
+    module globals. Every run imports the checks in a new process, so nothing
+    is cached between runs except for the files that the checks write next to
+    the reference data.
+    """
+    generate, folder, _ = CASES[case]
+    case_dir = ROOT / folder
+    files, overrides = generate(size, valid, random.Random(seed))
+    overrides.update(settings)
+    work_dir = prepare(case_dir, files, tmp_dir)
+    runs = []
+
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            runs.append(executor.submit(time_checks, case_dir, work_dir,
+                                        overrides).result())
+
+    results = []
+
+    for checks in zip(*runs):
+        times = [c["seconds"] for c in checks if c["seconds"] is not None]
+        result = dict(checks[0], seconds=min(times) if times else None)
+        result.update(case=case, size=size, valid=valid,
+                      bytes=len(files[required_file(case_dir)]))
+        results.append(result)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("cases", nargs="*",
+                        help="cases to benchmark, all by default")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+",
+                        help="sizes of the outputs, per case by default")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="number of runs to take the fastest of")
+    parser.add_argument("-o", "--output",
+                        help="file to write the results to as JSON")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the generators")
+    parser.add_argument("--set", action="append", default=[],
+                        metavar="NAME=VALUE",
+                        help="set a global of the checks, like "
+                             "FREE_SPACE_ENGINE=raster")
+    args = parser.parse_args()
+    settings = {}
+
+    for setting in args.set:
+        name, _, value = setting.partition("=")
+
+        try:
+            settings[name] = json.loads(value)
+        except ValueError:
+            settings[name] = value
+
+    for case in args.cases:
+        if case not in CASES:
+            parser.error(f"unknown case '{case}', expected one of: "
+                         f"{', '.join(CASES)}")
+
+    results = []
+    print(f"{'case':<20}{'size':>8}{'valid':>7}  {'check':<24}"
+          f"{'seconds':>10}  passed")
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp_dir:
+        for case in args.cases or CASES:
+            for size in args.sizes or CASES[case][2]:
+                for valid in [True, False]:
+                    for r in benchmark(case, size, valid, args.repeat,
+                                       args.seed, settings, tmp_dir):
+                        results.append(r)
+                        seconds = "-" if r["seconds"] is None else \
+                            f"{r['seconds']:.4f}"
+                        print(f"{case:<20}{size:>8}{str(valid):>7}  "
+                              f"{r['check']:<24}{seconds:>10}  "
+                              f"{r.get('error', r['passed'])}", flush=True)
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump({"python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "repeat": args.repeat, "seed": args.seed,
+                       "settings": settings, "results": results}, outfile,
+                      indent=4)
+
+
+if __name__ == "__main__":
+    main()
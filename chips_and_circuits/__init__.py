@@ -6,8 +6,8 @@ does so by doing the following tests in this order:
     - Check if the file has valid values and is structured correctly
     - Check if all connections from the designated netlist have been made.
     - Check if coordinates of the nets are in the wire lists
-    - Check if the wires do not overlap
     - Check if the wires actually connect the designated nets
+    - Check if the wires do not share segments
     - Check if the length in output.csv is equal to the computed wire length
 
 @author: Okke van Eck
@@ -15,11 +15,20 @@ does so by doing the following tests in this order:
 """
 
 import check50
-import pandas as pd
-import numpy as np
 import os
 import re
-import networkx as nx
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+common = check50.import_checks("../common")
+
+
+# A wire list of a net, with the coordinates in it and the format of a single
+# coordinate as it is reported when a wire list is malformed.
+WIRE_LIST = re.compile(r"\[\(\d+,\d+(?:,\d+)?\)(?:,\(\d+,\d+(?:,\d+)?\))*\]")
+WIRE_COORD = re.compile(r"\((\d+),(\d+)(?:,(\d+))?\)")
+COORD = re.compile(r"\d+,\d+(?:,\d+)?")
 
 
 @check50.check()
@@ -32,6 +41,9 @@ def exists():
 @check50.check(exists)
 def check_file():
     """Check if the structure and values of output.json are correct."""
+    import pandas as pd
+    import numpy as np
+
     # Check if output.csv has content.
     if os.stat("output.csv").st_size == 0:
         raise check50.Failure("Output.csv may not be empty. Provide at least "
@@ -74,7 +86,11 @@ def check_file():
 
         # Stop checking if no objects are in the output file.
         if len(df) == 1:
-            return
+            return {"chip": chip_id, "netlist": net_id,
+                    "length": int(df["wires"].iloc[-1]),
+                    "nets": np.zeros((0, 2), dtype=np.int64),
+                    "points": np.zeros((0, 3), dtype=np.int32),
+                    "offsets": np.zeros(1, dtype=np.int64)}
 
         # Check if all connections are of correct types.
         pattern = r"^\(\d+,\d+\)$"
@@ -93,253 +109,451 @@ def check_file():
             raise check50.Failure(error)
 
         # Check if all the wires are of correct types.
-        pattern = r"^\d+,\d+(,\d+)?$"
-        coords = [x[2:-2].split("),(") for x in df["wires"][:-1]]
-        wire_bools = [list(map(lambda x: bool(re.match(pattern, x)), c))
-                      for c in coords]
-        wire_bools = [(i, "".join(["(", coords[i][j], ")"]))
-                      for i, bools in enumerate(wire_bools)
-                      for j, b in enumerate(bools) if not b]
-
-        if wire_bools:
+        points, offsets, wire_errors = tokenize_wires(df["wires"][:-1])
+
+        if wire_errors:
             error = "Invalid coordinates for wires found.\n    Expected " \
                     "coordinates with format '(<int>,<int>[,<int>])', but " \
                     "found:\n"
 
-            for idx, coord in wire_bools:
+            for idx, coord in wire_errors:
                 error = "".join([error, f"\t'{coord}' \ton row "
                                         f"{idx + 2}\n"])
 
             raise check50.Failure(error)
 
+        nets = np.array([net[1:-1].split(",") for net in df["net"][:-1]],
+                        dtype=np.int64)
+
+        return {"chip": chip_id, "netlist": net_id,
+                "length": int(df["wires"].iloc[-1]), "nets": nets,
+                "points": points, "offsets": offsets}
+
+
+def tokenize_wires(wires):
+    """
+    Scan all wire lists into a flat (n, 3) int32 array of coordinates, where
+    2D coordinates are placed on layer 0, together with the offsets of the
+    wires of every net in that array.
+
+    Returns the coordinates, the offsets and a list of the row indices with
+    the malformed coordinates found.
+    """
+    import numpy as np
+
+    coords = array("i")
+    counts = []
+    errors = []
+
+    for row, wire in enumerate(wires):
+        # Empty cells are read by pandas as NaN.
+        if not isinstance(wire, str):
+            errors.append((row, ""))
+            counts.append(0)
+        elif not WIRE_LIST.fullmatch(wire):
+            bad = ["".join(["(", c, ")"]) for c in wire[2:-2].split("),(")
+                   if not COORD.fullmatch(c)]
+            errors.extend((row, c) for c in bad or [wire])
+            counts.append(0)
+        else:
+            matches = WIRE_COORD.findall(wire)
+            counts.append(len(matches))
+
+            for x, y, z in matches:
+                coords.extend([int(x), int(y), int(z or 0)])
+
+    points = np.frombuffer(coords, dtype=np.int32).reshape(-1, 3)
+    offsets = np.cumsum([0] + counts)
+
+    return points, offsets, errors
+
 
 @check50.check(check_file)
-def check_structure():
+def check_structure(state):
     """Check if the structured solution of output.csv is correct."""
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
-        chip_id = int(df["net"].iloc[-1][5:6])
-        net_id = int(df["net"].iloc[-1][11:])
+    import numpy as np
 
-        # Create dict with coordinates of the print nets.
-        print_pos_3d = {}
+    chip_id = state["chip"]
+    net_id = state["netlist"]
+    nets = state["nets"]
+    points = state["points"]
+    offsets = state["offsets"]
 
-        with open(f"data/chip_{chip_id}/print_{chip_id}.csv") as printfile:
-            print_df = pd.read_csv(printfile)
+    # Check if all nets are gates on the print.
+    gate_ids, gate_coords = read_print(chip_id)
+    idxs = np.searchsorted(gate_ids, nets).clip(max=len(gate_ids) - 1)
+    unknown = np.argwhere(gate_ids[idxs] != nets)
 
-            for id, x, y in print_df.values:
-                print_pos_3d[id] = (x, y, 0)
+    if len(unknown):
+        error = f"Expected all nets to be on the print of chip_{chip_id}, " \
+                f"but did not find:\n"
 
-        # Check if all connections from netlist are specified.
-        with open(f"data/chip_{chip_id}/netlist_{net_id}.csv") as netlistfile:
-            netlist_df = pd.read_csv(netlistfile)
-            netlist_list = [tuple(n) for n in netlist_df.values.tolist()]
-            nets = [tuple(map(int, p[1:-1].split(",")))
-                    for p in df["net"][:-1].values.tolist()]
+        for idx, end in unknown:
+            error = "".join([error, f"\tnet {nets[idx, end]} \ton row "
+                                    f"{idx + 2}\n"])
 
-            # Add flipped values as well.
-            for p in df["net"][:-1].values.tolist():
-                nets.append(tuple(map(int, p[1:-1].split(",")[::-1])))
+        raise check50.Failure(error)
 
-            net_errors = []
+    # Check if all connections from netlist are specified.
+    netlist = read_netlist(chip_id, net_id)
+    missing = np.setdiff1d(pair_keys(netlist), pair_keys(nets))
 
-            # Check if all required connections are made.
-            for nl in netlist_list:
-                if nl not in nets:
-                    net_errors.append(nl)
+    if len(missing):
+        error = "Expected all connections from the netlist to be in " \
+                "the output, but did not find:\n"
 
-            if net_errors:
-                error = "Expected all connections from the netlist to be in " \
-                        "the output, but did not find:\n"
+        for a, b in zip(missing >> 32, missing & 0xFFFFFFFF):
+            error = "".join([error, f"\t'({a},{b})' or '({b},{a})'\n"])
 
-                for nl in net_errors:
-                    error = "".join([error, f"\t'({nl[0]},{nl[1]})' or "
-                                            f"'({nl[1]},{nl[0]})'\n"])
+        raise check50.Failure(error)
 
-                raise check50.Failure(error)
+    # Check if the coordinates of the nets in the print are also in the list
+    # with wires.
+    net_coords = gate_coords[idxs]
+    wire_nets = np.repeat(net_coords, np.diff(offsets), axis=0)
+    found = np.add.reduceat((points[:, None] == wire_nets).all(axis=2),
+                            offsets[:-1], axis=0) > 0
+    net_errors = np.argwhere(~found)
 
-        # Create lists with all coordinates in 3D.
-        wire_coords = [x[2:-2].split("),(") for x in df["wires"][:-1]]
-        wire_coords = [[tuple(int(c) for c in coord.split(","))
-                        for coord in coords] for coords in wire_coords]
-        wire_coords_3d = [[c if len(c) == 3 else (c[0], c[1], 0)
-                           for c in coords] for coords in wire_coords]
+    if len(net_errors):
+        error = "Expected to find all coordinates of nets in the wire " \
+                "lists, but did not find:\n"
 
-        # Check if the coordinates of the nets in the print are also in the list
-        # with wires.
-        net_errors = []
+        for idx, end in net_errors:
+            coord_3d = net_coords[idx, end]
+            error = "".join([error, f"\t'({coord_3d[0]},{coord_3d[1]},"
+                                    f"{coord_3d[2]})' \tor '({coord_3d[0]},"
+                                    f"{coord_3d[1]})' \tfor net "
+                                    f"{nets[idx, end]} \ton row {idx + 2}\n"])
 
-        for i, wires in enumerate(wire_coords_3d):
-            net_1, net_2 = df["net"].iloc[i][1:-1].split(",")
+        raise check50.Failure(error)
 
-            if print_pos_3d[int(net_1)] not in wires:
-                net_errors.append([i, net_1, print_pos_3d[int(net_1)]])
+    # Check if the wire lists do connect their designated nets. Since the
+    # nets are in the wire lists, every step between two consecutive wire
+    # coordinates has to go to a neighbour.
+    bad_steps = step_errors(points, offsets)
 
-            if print_pos_3d[int(net_2)] not in wires:
-                net_errors.append([i, net_2, print_pos_3d[int(net_2)]])
+    if len(bad_steps):
+        error = "Expected wires to connect designated nets, but found " \
+                "that:\n"
+        rows = np.searchsorted(offsets, bad_steps, side="right")
 
-        if net_errors:
-            error = "Expected to find all coordinates of nets in the wire " \
-                    "lists, but did not find:\n"
+        for k, row in zip(bad_steps, rows):
+            error = "".join([error, f"\tWire {tuple(points[k])} \tand "
+                                    f"{tuple(points[k + 1])} \ton row "
+                                    f"{row + 1} \tare not neighbours\n"])
 
-            for idx, net, coord_3d in net_errors:
-                error = "".join([error, f"\t'({coord_3d[0]},{coord_3d[1]},"
-                                        f"{coord_3d[2]})' \tor '({coord_3d[0]},"
-                                        f"{coord_3d[1]})' \tfor net {net} \ton "
-                                        f"row {idx + 2}\n"])
+        raise check50.Failure(error)
 
-            raise check50.Failure(error)
+    # Check if there are wires which surpass the maximum height of 7.
+    rows = np.repeat(np.arange(len(nets)), np.diff(offsets))
+    invalid_height = np.nonzero(points[:, 2] > 7)[0]
 
-        # Check if the wire lists do connect their designated nets.
-        connect_errors = []
+    if len(invalid_height):
+        error = "Wires cannot go higher than the 7th layer, but found:\n"
 
-        for i, wires in enumerate(wire_coords_3d):
-            net_1, net_2 = df["net"].iloc[i][1:-1].split(",")
-            net_1_coord = print_pos_3d[int(net_1)]
-            net_2_coord = print_pos_3d[int(net_2)]
+        for k in invalid_height:
+            error = "".join([error, f"\tWire {tuple(points[k])} \ton row "
+                                    f"{rows[k] + 2}\n"])
 
-            # Create a new graph and add nodes for origin and destination.
-            graph = nx.Graph()
-            graph.add_nodes_from([0, 1])
-            nodes = {net_1_coord: 0, net_2_coord: 1}
+        raise check50.Failure(error)
 
-            # Add nodes for all the wires.
-            for j, coord in enumerate(wires):
-                if coord != net_1_coord and coord != net_2_coord:
-                    graph.add_node(j + 2)
-                    nodes[coord] = j + 2
+    # Check if all coordinates fall within the dimensions of the base layer,
+    # which has a margin of one around the gates.
+    low = gate_coords.min(axis=0) - [1, 1, 0]
+    high = gate_coords.max(axis=0) + [1, 1, 7]
+    outside = np.nonzero((points[:, :2] > high[:2]).any(axis=1) |
+                         (points[:, :2] < low[:2]).any(axis=1))[0]
 
-            # Create edges between neighbouring nodes.
-            for coord, id in nodes.items():
-                cur_pos = list(coord)
+    if len(outside):
+        error = "All wires have to be placed within the dimensions of the " \
+                "base layer, but found:\n"
 
-                # Check neighbours by changing a specific axis.
-                for move in [-3, -2, -1, 1, 2, 3]:
-                    cur_pos[abs(move) - 1] += move // abs(move)
+        for k in outside:
+            error = "".join([error, f"\tWire {tuple(points[k])} \ton row "
+                                    f"{rows[k] + 2}\n"])
+
+        raise check50.Failure(error)
 
-                    if tuple(cur_pos) in nodes:
-                        graph.add_edge(id, nodes[tuple(cur_pos)])
+    # Check if no wires share a segment. Crossing in a single point is
+    # allowed, but costs an intersection.
+    intersections, shared = wire_overlaps(points, offsets, net_coords, low,
+                                          high)
 
-                    cur_pos[abs(move) - 1] -= move // abs(move)
+    if len(shared):
+        error = "Wires may not share a segment, but found:\n"
 
-            # Check if a path has been created between origin and destination.
-            if not nx.has_path(graph, 0, 1):
-                connect_errors.append([i, net_1, net_2])
+        for (a, b), net_idxs in shared:
+            rows = ", ".join(str(idx + 2) for idx in net_idxs)
+            error = "".join([error, f"\tSegment {tuple(a)} to {tuple(b)} \t"
+                                    f"used by the wires on rows {rows}\n"])
 
-        if connect_errors:
-            error = "Expected wires to connect designated nets, but found " \
-                    "that:\n"
+        raise check50.Failure(error)
 
-            for row, net_1, net_2 in connect_errors:
-                error = "".join([error, f"\tNet {net_1} \tand net {net_2} \t"
-                                        f"were not connected with wires from "
-                                        f"row {row + 2}\n"])
+    state.update(net_coords=net_coords, low=low, high=high,
+                 intersections=intersections)
+    return state
 
-            raise check50.Failure(error)
 
-        # Check if there are wires which surpass the maximum height of 7.
-        invalid_height = [[(w, i + 1) for w in wires if w[2] > 7]
-                          for i, wires in enumerate(wire_coords_3d)]
+def wire_overlaps(points, offsets, net_coords, low, high):
+    """
+    Find the intersections and shared segments of all wires in one pass of
+    sorting (voxel, net) and (segment, net) keys on linearized voxel ids.
 
-        error = "Wires cannot go higher than the 7th layer, but found:\n"
-        error_found = False
+    A voxel that is used by k different nets, other than as their own gate,
+    counts as k - 1 intersections, so a net that visits a voxel twice does not
+    intersect itself. A segment between two voxels that is used by more than
+    one net is a shared segment, which is not allowed.
 
-        for height in invalid_height:
-            if height:
-                error_found = True
-                for wire, row in height:
-                    error = "".join([error, f"\tWire {wire} \ton row {row}\n"])
+    Returns the number of intersections and a list with the coordinates of
+    every shared segment and the indices of the nets that use it.
+    """
+    import numpy as np
 
-        if error_found:
-            raise check50.Failure(error)
+    dims = tuple(high - low + 1)
+    n_voxels = np.prod(dims, dtype=np.int64)
+    n_nets = max(len(offsets) - 1, 1)
+    nets_of = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    voxels = np.ravel_multi_index((points - low).T, dims).astype(np.int64)
 
-        # Check if all coordinates fall within the dimensions of the base layer.
-        with open(f"data/chip_{chip_id}/print_{chip_id}.csv") as printfile:
-            print_df = pd.read_csv(printfile)
-            x_min = print_df["x"].min()
-            x_max = print_df["x"].max()
-            y_min = print_df["y"].min()
-            y_max = print_df["y"].max()
+    # Count the different nets per voxel, skipping the gates of every net.
+    wire_nets = np.repeat(net_coords, np.diff(offsets), axis=0)
+    is_gate = (points[:, None] == wire_nets).all(axis=2).any(axis=1)
+    keys = np.unique(voxels[~is_gate] * n_nets + nets_of[~is_gate])
+    occupancy = np.bincount(keys // n_nets, minlength=n_voxels)
+    intersections = int(np.maximum(occupancy - 1, 0).sum())
 
-        error = "All wires have to be placed within the dimensions of the " \
-                "base layer, but found:\n"
-        error_found = False
+    # Count the different nets per segment between consecutive voxels.
+    same_net = nets_of[1:] == nets_of[:-1]
+    a = voxels[:-1][same_net]
+    b = voxels[1:][same_net]
+    segments = np.minimum(a, b) * n_voxels + np.maximum(a, b)
+    keys = np.unique(segments * n_nets + nets_of[:-1][same_net])
+    segments, starts, counts = np.unique(keys // n_nets, return_index=True,
+                                         return_counts=True)
+    shared = []
 
-        for i, wires in enumerate(wire_coords):
-            for wire in wires:
-                if wire[0] > x_max + 1 or wire[0] < x_min - 1 or \
-                        wire[1] > y_max + 1 or wire[1] < y_min - 1:
-                    error_found = True
-                    error = "".join([error, f"\tWire {wire} \ton row {i}\n"])
+    for segment, start, count in zip(segments, starts, counts):
+        if count > 1:
+            ends = np.unravel_index(divmod(segment, n_voxels), dims)
+            coords = np.array(ends).T + low
+            shared.append((coords, keys[start:start + count] % n_nets))
 
-        if error_found:
-            raise check50.Failure(error)
+    return intersections, shared
 
 
-@check50.check(check_structure)
-def check_cost():
-    """Check if solution costs as much as specified in output.csv."""
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
-        chip_id = int(df["net"].iloc[-1][5:6])
+@lru_cache(maxsize=None)
+def read_print(chip_id):
+    """
+    Read the print of a chip. Returns the sorted gate ids and their
+    coordinates on layer 0 as an (n, 3) array.
+    """
+    import numpy as np
 
-        # Create dict with coordinates of the print nets.
-        print_pos_3d = {}
+    gates = np.loadtxt(f"data/chip_{chip_id}/print_{chip_id}.csv",
+                       delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)
+    gates = gates[np.argsort(gates[:, 0])]
+    coords = np.zeros((len(gates), 3), dtype=np.int64)
+    coords[:, :2] = gates[:, 1:]
 
-        with open(f"data/chip_{chip_id}/print_{chip_id}.csv") as printfile:
-            print_df = pd.read_csv(printfile)
+    return gates[:, 0], coords
 
-            for id, x, y in print_df.values:
-                print_pos_3d[id] = (x, y, 0)
 
-        # Create lists with all coordinates in 3D.
-        wire_coords = [x[2:-2].split("),(") for x in df["wires"][:-1]]
-        wire_coords = [[tuple(int(c) for c in coord.split(","))
-                        for coord in coords] for coords in wire_coords]
-        wire_coords_3d = [[c if len(c) == 3 else (c[0], c[1], 0)
-                           for c in coords] for coords in wire_coords]
+@lru_cache(maxsize=None)
+def read_netlist(chip_id, net_id):
+    """Read the netlist of a chip as an (n, 2) array of gate ids."""
+    import numpy as np
 
-        # Check if any of the intermediate wires overlap. Only begin and end may
-        # overlap since this is the net itself.
-        wire_coords_3d_flatten = {}
-        wire_errors = []
+    return np.loadtxt(f"data/chip_{chip_id}/netlist_{net_id}.csv",
+                      delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)
 
-        for i, wires in enumerate(wire_coords_3d):
-            net_1, net_2 = df["net"].iloc[i][1:-1].split(",")
-            net_1_coord = print_pos_3d[int(net_1)]
-            net_2_coord = print_pos_3d[int(net_2)]
 
-            for c in wires:
-                if c != net_1_coord and c != net_2_coord:
-                    if c in wire_coords_3d_flatten:
-                        wire_errors.append([c, wire_coords_3d_flatten[c], i])
-                    else:
-                        wire_coords_3d_flatten[c] = i
+def pair_keys(pairs):
+    """
+    Return the sorted unique int64 keys of the (min, max) of every pair of
+    gate ids, so both orientations of a connection have the same key.
+    """
+    import numpy as np
 
-        intersections = len(wire_errors)
+    pairs = np.sort(pairs.reshape(-1, 2), axis=1)
 
-        # Compute the total number of wires used.
-        wire_lengths = []
+    return np.unique(pairs[:, 0] << 32 | pairs[:, 1])
 
-        for i, wires in enumerate(wire_coords):
-            net_1, net_2 = df["net"].iloc[i][1:-1].split(",")
-            wire_lengths.append([net_1, net_2, len(wires) - 1])
 
-        wire_count = sum([x[2] for x in wire_lengths])
+def step_errors(points, offsets):
+    """
+    Return the indices of the wire coordinates that are not followed by a
+    neighbouring coordinate of the same net.
+    """
+    import numpy as np
 
-        # Check if the total costs are equal to the ones in output.csv.
-        total_costs = wire_count + 300 * intersections
+    steps = np.abs(np.diff(points.astype(np.int64), axis=0)).sum(axis=1)
+    same_net = np.ones(len(steps), dtype=bool)
+    same_net[offsets[1:-1][offsets[1:-1] > 0] - 1] = False
 
-        if total_costs != int(df["wires"].iloc[-1]):
-            error = f"Length in output.csv is not equal to the computed " \
-                    f"length.\n    Computed wire length of {total_costs} is " \
-                    f"made up of:\n"
+    return np.nonzero(same_net & (steps != 1))[0]
 
-            for net_1, net_2, length in wire_lengths:
-                error = "".join([error, f"\t{length} \twires between net "
-                                        f"{net_1} \tand net {net_2}\n"])
-            error = "".join([error, f"\t{300  * intersections} \textra costs "
-                                    f"for 300 * {intersections} "
-                                    f"intersections\n"])
 
-            raise check50.Failure(error)
+@check50.check(check_structure)
+def check_cost(state):
+    """Check if solution costs as much as specified in output.csv."""
+    import numpy as np
+
+    nets = state["nets"]
+    offsets = state["offsets"]
+    intersections = state["intersections"]
+
+    # Compute the total number of wires used.
+    wire_lengths = np.diff(offsets) - 1
+    wire_count = int(wire_lengths.sum())
+
+    # Check if the total costs are equal to the ones in output.csv.
+    total_costs = wire_count + 300 * intersections
+
+    if total_costs != state["length"]:
+        error = f"Length in output.csv is not equal to the computed " \
+                f"length.\n    Computed wire length of {total_costs} is " \
+                f"made up of:\n"
+
+        for (net_1, net_2), length in zip(nets, wire_lengths):
+            error = "".join([error, f"\t{length} \twires between net "
+                                    f"{net_1} \tand net {net_2}\n"])
+        error = "".join([error, f"\t{300  * intersections} \textra costs "
+                                f"for 300 * {intersections} "
+                                f"intersections\n"])
+
+        raise check50.Failure(error)
+
+    # Report how far the wire length is above the lower bound of the netlist.
+    bound = lower_bound(state["chip"], state["netlist"])
+    check50.log(f"lower bound for the wire length of netlist "
+                f"{state['netlist']} is {bound}")
+
+    if bound:
+        check50.log(f"wire length of {wire_count} is "
+                    f"{wire_count / bound - 1:.2%} above the lower bound")
+
+
+@lru_cache(maxsize=None)
+def lower_bound(chip_id, net_id):
+    """
+    Return a lower bound on the wire length of a netlist, which is the sum of
+    the Manhattan distances between the gates of every connection. It is
+    cached in the bound file of the netlist, keyed by the hash of the print
+    and netlist files, and only recomputed if those changed.
+    """
+    import numpy as np
+
+    folder = f"data/chip_{chip_id}"
+    digest = common.file_hash(f"{folder}/print_{chip_id}.csv",
+                              f"{folder}/netlist_{net_id}.csv")
+
+    def compute():
+        gate_ids, gate_coords = read_print(chip_id)
+        netlist = read_netlist(chip_id, net_id)
+        ends = gate_coords[np.searchsorted(gate_ids, netlist)]
+
+        return {"length": int(np.abs(ends[:, 0] - ends[:, 1]).sum())}
+
+    return common.cached_json(f"{folder}/netlist_{net_id}_bound.json",
+                              digest, compute)["length"]
+
+
+class RoutingState:
+    """
+    Incremental cost of routing nets on a chip, for solvers that rip up and
+    reroute single nets. It uses the same rules as wire_overlaps: the cost is
+    the wire length plus 300 times the intersections, where a voxel used by k
+    different nets, other than as their gates, is k - 1 intersections. The
+    number of segments shared between nets is tracked as well, since a
+    routing is only valid if it is zero. Routing or unrouting a net updates
+    all of them in O(path length).
+    """
+
+    def __init__(self, gate_ids, gate_coords):
+        """
+        Create an empty routing for a print, given as the sorted gate ids and
+        their coordinates returned by read_print.
+        """
+        import numpy as np
+
+        self.gate_ids = np.asarray(gate_ids)
+        self.gate_coords = np.asarray(gate_coords, dtype=np.int64)
+        self.low = self.gate_coords.min(axis=0) - [1, 1, 0]
+        self.dims = tuple(self.gate_coords.max(axis=0) + [1, 1, 7]
+                          - self.low + 1)
+        self.occupancy = np.zeros(np.prod(self.dims), dtype=np.int32)
+        self.segments = Counter()
+        self.routes = {}
+        self.length = 0
+        self.intersections = 0
+        self.shared_segments = 0
+
+    @property
+    def cost(self):
+        """Return the total cost of the routed nets."""
+        return self.length + 300 * self.intersections
+
+    def route(self, net, path):
+        """
+        Route a net, given as a pair of gate ids, along a path of 2D or 3D
+        coordinates. A net that was already routed is unrouted first. A path
+        that is not a walk or leaves the chip raises a ValueError and leaves
+        the routing as it was.
+        """
+        import numpy as np
+
+        net = tuple(net)
+        path = np.asarray(path, dtype=np.int64)
+        path = np.pad(path, ((0, 0), (0, 3 - path.shape[1])))
+
+        if len(step_errors(path, np.array([0, len(path)]))):
+            raise ValueError(f"Path of net {net} is not a walk over "
+                             f"neighbouring coordinates")
+
+        # Find the voxels before unrouting, since a path that leaves the
+        # chip raises a ValueError here.
+        voxels, segments = self._voxels(net, path)
+
+        if net in self.routes:
+            self.unroute(net)
+
+        self.intersections += int((self.occupancy[voxels] > 0).sum())
+        self.occupancy[voxels] += 1
+
+        for segment in segments:
+            self.shared_segments += self.segments[segment] > 0
+            self.segments[segment] += 1
+
+        self.length += len(path) - 1
+        self.routes[net] = (path, voxels, segments)
+
+    def unroute(self, net):
+        """Remove the route of a net and return its path."""
+        path, voxels, segments = self.routes.pop(tuple(net))
+        self.occupancy[voxels] -= 1
+        self.intersections -= int((self.occupancy[voxels] > 0).sum())
+
+        for segment in segments:
+            self.segments[segment] -= 1
+            self.shared_segments -= self.segments[segment] > 0
+
+        self.length -= len(path) - 1
+
+        return path
+
+    def _voxels(self, net, path):
+        """
+        Return the unique linearized voxel ids of a path without its gates,
+        and the unique segments between its consecutive voxels.
+        """
+        import numpy as np
+
+        idxs = np.searchsorted(self.gate_ids, net)
+        gates = self.gate_coords[idxs]
+        is_gate = (path[:, None] == gates).all(axis=2).any(axis=1)
+        voxels = np.ravel_multi_index((path - self.low).T, self.dims)
+        segments = set(zip(np.minimum(voxels[:-1], voxels[1:]).tolist(),
+                           np.maximum(voxels[:-1], voxels[1:]).tolist()))
+
+        return np.unique(voxels[~is_gate]), segments
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+This file has the helpers that are shared by the checks of the cases. It is
+not a case itself, but is imported by the checks with:
+    common = check50.import_checks("../common")
+
+The output files of most cases are small csv files with a fixed header. These
+are read with the csv module into typed columns, so the checks do not have to
+import pandas for them. Output files that can be very long are read row by
+row with read_rows instead.
+
+Results that are slow to compute, like lower bounds and optima, are cached in
+JSON files with cached_json, keyed by the file_hash of the files they are
+computed from.
+
+@author: Okke van Eck
+@contact: okke.van.eck@gmail.com
+"""
+
+import check50
+import csv
+import hashlib
+import json
+import os
+
+
+# Number of characters that read_rows reads from a file at a time.
+CHUNK_SIZE = 2 ** 16
+
+
+def number(value):
+    """Convert a string to an int, or to a float if it is not an integer."""
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+# Types of the columns of the csv files that are read by the checks, by header.
+SCHEMAS = {
+    ("amino", "fold"): (str, int),
+    ("car", "move"): (str, int),
+    ("car", "orientation", "row", "col", "length"): (str, str, int, int, int),
+    ("train", "stations"): (str, str),
+    ("station", "x", "y"): (str, float, float),
+    ("station1", "station2", "distance"): (str, str, number),
+    ("id", "type"): (str, str),
+    ("id", "neighbours"): (int, str),
+}
+
+
+def read_csv(path):
+    """
+    Read a csv file into its header and a dict with a list of values per
+    column. The columns of a known header are converted to the types in
+    SCHEMAS. Values that can not be converted are kept as strings, so the
+    checks can report them by row.
+
+    Files with an unknown header are read with pandas if it is installed, or
+    as strings otherwise. Empty lines are skipped like pandas does.
+    """
+    with open(path, newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        rows = [row for row in reader if row]
+
+    schema = SCHEMAS.get(tuple(header))
+
+    if schema is None:
+        try:
+            import pandas as pd
+        except ImportError:
+            schema = (str,) * len(header)
+        else:
+            df = pd.read_csv(path)
+            return list(df), {name: df[name].tolist() for name in df}
+
+    # Check if every row has a value for every column.
+    for idx, row in enumerate(rows):
+        if len(row) != len(header):
+            raise check50.Failure(f"Expected {len(header)} values on every "
+                                  f"row, but found {len(row)} values on row "
+                                  f"{idx + 2}.")
+
+    columns = {}
+
+    for name, convert, values in zip(header, schema, zip(*rows)):
+        columns[name] = [convert_value(convert, value) for value in values]
+
+    for name in header:
+        columns.setdefault(name, [])
+
+    return header, columns
+
+
+def convert_value(convert, value):
+    """Convert a value from a csv file, or keep it if that is not possible."""
+    try:
+        return convert(value)
+    except ValueError:
+        return value
+
+
+def read_rows(path):
+    """
+    Read the non-empty rows of a csv file in blocks of CHUNK_SIZE characters,
+    so only a single block of the file is in memory at a time.
+    """
+    def lines():
+        rest = ""
+
+        with open(path, newline="") as csvfile:
+            for block in iter(lambda: csvfile.read(CHUNK_SIZE), ""):
+                *complete, rest = (rest + block).split("\n")
+
+                for line in complete:
+                    yield line + "\n"
+
+        if rest:
+            yield rest
+
+    return (row for row in csv.reader(lines()) if row)
+
+
+def file_hash(*paths):
+    """Compute the sha256 hex digest of the contents of the given files."""
+    digest = hashlib.sha256()
+
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+def cached_json(path, digest, compute):
+    """
+    Return the dict that compute returns, which is cached in the JSON file at
+    path together with digest, the sha256 hex digest of what it is computed
+    from. It is only computed again if the digest in the file is different.
+
+    The file is written through a temporary file, since other checks may
+    read it at the same time, and is not written if that is not possible.
+    """
+    try:
+        with open(path) as jsonfile:
+            cached = json.load(jsonfile)
+
+        if cached["sha256"] == digest:
+            return cached
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    result = dict(compute(), sha256=digest)
+
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        with open(f"{path}.{os.getpid()}", "w") as jsonfile:
+            json.dump(result, jsonfile, indent=4)
+
+        os.replace(f"{path}.{os.getpid()}", path)
+    except OSError:
+        pass
+
+    return result
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Measure how long it takes to import the checks of every case. check50 imports
+the checks once for every check it runs, so numpy, pandas and shapely are only
+imported inside the checks that use them. This script makes sure that stays
+that way: every case module is imported in a fresh interpreter and the time on
+top of importing check50 itself is compared against the budget of the case.
+
+Usage: python import_budget.py [-r 5] [--json]
+
+The exit code is 1 if any case is over its budget.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent
+
+# Import time budget in milliseconds per case, on top of importing check50.
+BUDGETS = {
+    "amstelhaege": 25,
+    "chips_and_circuits": 25,
+    "protein_powder": 25,
+    "radio_russia": 25,
+    "railnl/holland": 25,
+    "railnl/national": 25,
+    "rush_hour/board6x6_1": 25,
+    "smartgrid": 25,
+}
+
+# Imports the checks of a case like check50 does and prints the time it took
+# in seconds, after printing the time it took to import check50.
+TIMER = """
+import sys, time
+start = time.perf_counter()
+import check50
+from check50 import internal
+print(time.perf_counter() - start)
+internal.check_dir = internal.Path(sys.argv[1])
+start = time.perf_counter()
+internal.import_file("checks", sys.argv[1] + "/__init__.py")
+print(time.perf_counter() - start)
+"""
+
+
+def import_time(case, repeat):
+    """
+    Return the fastest time in milliseconds it took to import the checks of a
+    case, together with the fastest time it took to import check50.
+    """
+    base, checks = [], []
+
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", TIMER, str(ROOT / case)],
+                             cwd=ROOT / case, capture_output=True, text=True,
+                             check=True).stdout.split()
+        base.append(float(out[0]) * 1000)
+        checks.append(float(out[1]) * 1000)
+
+    return min(checks), min(base)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="number of imports to take the fastest of")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+
+    for case, budget in BUDGETS.items():
+        checks, base = import_time(case, args.repeat)
+        results.append({"case": case, "check50_ms": round(base, 1),
+                        "checks_ms": round(checks, 1), "budget_ms": budget,
+                        "passed": checks <= budget})
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(f"{'case':<24}{'check50':>10}{'checks':>10}{'budget':>10}")
+
+        for r in results:
+            print(f"{r['case']:<24}{r['check50_ms']:>10}{r['checks_ms']:>10}"
+                  f"{r['budget_ms']:>10}{'' if r['passed'] else '  over'}")
+
+    sys.exit(not all(r["passed"] for r in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,15 +11,30 @@ does so by doing the following tests in this order:
     Note that the last test requires variables from the one before. It is
     therefor not possible to switch the order of these two tests!
 
+Many folds of the same protein can be scored at once with score_folds, which
+uses the same bond scores as the last test and can also be imported outside
+of check50. For proteins of at most
+EXACT_MAX_LENGTH aminos, the last test also reports how far the score is from
+the best possible score, which is found once per protein by fold_exact.
+
 @author: Okke van Eck
 @contact: okke.van.eck@gmail.com
 """
 
 import check50
-import pandas as pd
-import numpy as np
+import hashlib
 import os
 
+# Score of a bond between two non-connected neighbour aminos, by their types.
+BOND_SCORES = {"HH": -1, "HC": -1, "CC": -5}
+
+# Longest protein for which the best possible score is searched for, by
+# dimension. The search takes exponential time in the length of the protein,
+# so these keep it at a few seconds, well within the timeout of check50. It
+# is only done once per protein and dimension, since the results are kept in
+# the optima folder next to the checks, which has those of the examples.
+EXACT_MAX_LENGTH = {2: 18, 3: 12}
+
 
 @check50.check()
 def exists():
@@ -35,111 +50,135 @@ def check_file():
         raise check50.Failure("Output.csv may not be empty. Provide at least "
                               "an header row and a row with a score.")
 
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
+    # The shared helpers are imported by the checks instead of the module, so
+    # score_folds can also be imported outside of check50.
+    common = check50.import_checks("../common")
+    rows = common.read_rows("output.csv")
 
-        # Check header for correct format.
-        if list(df) != ["amino", "fold"]:
-            raise check50.Failure("Expected header of the csv to be "
-                                  "'amino,fold'")
+    # Check header for correct format.
+    if next(rows, []) != ["amino", "fold"]:
+        raise check50.Failure("Expected header of the csv to be "
+                              "'amino,fold'")
 
-        # Check footer for correct format.
-        if len(df) < 1 or df['amino'].iloc[-1] != "score":
-            raise check50.Failure("Expected last row of the csv to be "
-                                  "'score,<integer>'")
+    # Check the values of every row when the next row is read, since only
+    # the rows before the last one hold aminos.
+    inv_aminos = []
+    inv_folds = []
+    last = None
+    fold = None
 
-        try:
-            int(df['fold'].iloc[-1])
-        except ValueError:
-            raise check50.Failure("Expected last row of the csv to be "
-                                  "'score,<integer>'")
+    for idx, row in enumerate(rows):
+        if len(row) != 2:
+            raise check50.Failure(f"Expected 2 values on every row, but "
+                                  f"found {len(row)} values on row "
+                                  f"{idx + 2}.")
 
-        # Stop checking if there are no aminos in the output file.
-        if len(df) == 1:
-            return
+        if last is not None:
+            if last[0] not in ("H", "P", "C"):
+                inv_aminos.append((idx + 1, last[0]))
+
+            fold = common.convert_value(int, last[1])
 
-        # Check if all values in the amino column are of correct datatype and
-        # value, except for the last row.
-        amino_bools = df["amino"][:-1].isin(["H", "P", "C"]).values
+            if not isinstance(fold, int):
+                inv_folds.append((idx + 1, fold))
 
-        if False in amino_bools:
-            idxs = np.where(amino_bools == False)[0]
-            error = "Invalid letter(s) used for an amino. Expected 'H', 'P' " \
-                    "or 'C', but found:\n"
+        last = row
 
-            for idx in idxs:
-                error = "".join([error, f"\t'{df['amino'][idx]}' \ton row "
-                                        f"{idx + 2}\n"])
+    # Check footer for correct format.
+    score = common.convert_value(int, last[1]) if last else None
 
-            raise check50.Failure(error)
+    if last is None or last[0] != "score" or not isinstance(score, int):
+        raise check50.Failure("Expected last row of the csv to be "
+                              "'score,<integer>'")
 
-        # Check if all values in the fold column are of correct datatype and
-        # value, except for the last row.
-        if df["fold"].dtype != "int" or df["fold"].iloc[-2] != 0:
-            error = "Invalid value(s) used for a fold. Expected integers, " \
-                    "but found:\n"
+    # Stop checking if there are no aminos in the output file.
+    if fold is None:
+        return
 
-            for i, item in enumerate(df['fold']):
-                try:
-                    int(item)
-                except ValueError:
-                    error = "".join([error, f"\t'{df['fold'][i]}' \ton row "
-                                            f"{i + 2}\n"])
+    # Check if all values in the amino column are of correct datatype and
+    # value, except for the last row.
+    if inv_aminos:
+        error = "Invalid letter(s) used for an amino. Expected 'H', 'P' " \
+                "or 'C', but found:\n"
 
-            if df["fold"].iloc[-2] != 0:
-                error = "".join([error, f"\t'{df['fold'].iloc[-2]}' \ton row "
-                                        f"{len(df['fold']) - 2}. Expected 0 "
-                                        f"since it is the last amino.\n"])
+        for row_nr, amino in inv_aminos:
+            error = "".join([error, f"\t'{amino}' \ton row {row_nr}\n"])
 
-            raise check50.Failure(error)
+        raise check50.Failure(error)
 
-        # Check if the score in the last row is of correct value.
-        if df["fold"].values[-1] > 0:
-            raise check50.Failure("The score for a fold should be negative.")
+    # Check if all values in the fold column are of correct datatype and
+    # value, except for the last row.
+    if inv_folds or fold != 0:
+        error = "Invalid value(s) used for a fold. Expected integers, " \
+                "but found:\n"
+
+        for row_nr, value in inv_folds:
+            error = "".join([error, f"\t'{value}' \ton row {row_nr}\n"])
+
+        if fold != 0:
+            error = "".join([error, f"\t'{fold}' \ton row {idx + 1}. "
+                                    f"Expected 0 since it is the last "
+                                    f"amino.\n"])
+
+        raise check50.Failure(error)
+
+    # Check if the score in the last row is of correct value.
+    if score > 0:
+        raise check50.Failure("The score for a fold should be negative.")
 
 
 @check50.check(check_file)
 def check_structure():
     """Check if amino placement is correct."""
     hc_pos = {}
+    pos_set = set()
+    pos = []
+    next_dir = 0
+    sequence = []
+
+    # Walk the protein while reading output.csv, so the file is only read up
+    # to the first amino that lands on another one. The footer is the last
+    # row, so every row is handled when the next one is read.
+    common = check50.import_checks("../common")
+    rows = common.read_rows("output.csv")
+    next(rows)
+    row = next(rows)
 
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
-        user_score = df["fold"].iloc[-1]
-        dim = df["fold"][:-1].abs().max()
+    for next_row in rows:
+        amino, fold = row[0], int(row[1])
 
-        # Stop checking if there are no aminos are in the output file.
-        if len(df) == 1:
-            return hc_pos, user_score
+        # Compute position of this amino. Check for division by zero.
+        if next_dir:
+            pos[abs(next_dir) - 1] += next_dir // abs(next_dir)
 
-        # Initialise values for origin amino.
-        pos_set = {tuple(0 for _ in range(dim))}
-        pos = list(0 for _ in range(dim))
-        next_dir = df["fold"].iloc[0]
+        # Set link info and add a dimension if the next amino needs it.
+        prev_dir = -next_dir
+        next_dir = fold
 
-        if df["amino"].iloc[0] == "H" or df["amino"].iloc[0] == "C":
-            hc_pos[tuple(pos)] = [df["amino"].iloc[0], 0, next_dir]
+        if abs(fold) > len(pos):
+            pad = (0,) * (abs(fold) - len(pos))
+            pos.extend(pad)
+            pos_set = {p + pad for p in pos_set}
+            hc_pos = {p + pad: info for p, info in hc_pos.items()}
 
-        for _, [amino, fold] in df[1:-1].iterrows():
-            # Compute position of next amino. Check for division by zero.
-            if next_dir:
-                pos[abs(next_dir) - 1] += next_dir // abs(next_dir)
+        # Remember amino if possible score maker.
+        if amino == "H" or amino == "C":
+            hc_pos[tuple(pos)] = [amino, prev_dir, next_dir]
 
-            # Set link info and remember amino if possible score maker.
-            prev_dir = -next_dir
-            next_dir = fold
+        # Check if protein folds onto itself.
+        if tuple(pos) in pos_set:
+            raise check50.Failure("Protein folds onto itself, which is "
+                                  "not possible.")
 
-            if amino == "H" or amino == "C":
-                hc_pos[tuple(pos)] = [amino, prev_dir, next_dir]
+        pos_set.add(tuple(pos))
 
-            # Check if protein folds onto itself.
-            if tuple(pos) in pos_set:
-                raise check50.Failure("Protein folds onto itself, which is "
-                                      "not possible.")
+        # Only short proteins are compared with their best possible score.
+        if len(sequence) <= max(EXACT_MAX_LENGTH.values()):
+            sequence.append(amino)
 
-            pos_set.update([tuple(pos)])
+        row = next_row
 
-    return hc_pos, user_score
+    return hc_pos, int(row[1]), "".join(sequence), max(len(pos), 2)
 
 
 def get_neighbour_aminos(pos, prev_dir, next_dir, hc_coords):
@@ -169,29 +208,24 @@ def get_neighbour_aminos(pos, prev_dir, next_dir, hc_coords):
 @check50.check(check_structure)
 def check_score(state):
     """Check if solution produces score specified in output.csv."""
-    hc_pos, user_score = state
+    hc_pos, user_score, sequence, dim = state
 
     # Loop over all Hs and Cs and compute their score to get the total score.
-    hh_score = 0
-    hc_score = 0
-    cc_score = 0
+    scores = dict.fromkeys(BOND_SCORES, 0)
     hc_coords = hc_pos.keys()
 
     for pos, [amino, prev_dir, next_dir] in hc_pos.items():
         neighbours = get_neighbour_aminos(pos, prev_dir, next_dir, hc_coords)
 
-        # Iterate over neighbour aminos and check if it scored points.
+        # Iterate over neighbour aminos and add the score of their bond.
         for n in neighbours:
-            if amino == "H" and hc_pos[n][0] == "H":
-                hh_score -= 1
-            elif amino != hc_pos[n][0]:
-                hc_score -= 1
-            else:
-                cc_score -= 5
+            bond = "".join(sorted(amino + hc_pos[n][0], reverse=True))
+            scores[bond] += BOND_SCORES[bond]
 
-    hh_score //= 2
-    hc_score //= 2
-    cc_score //= 2
+    # Every bond is counted from both of its aminos.
+    hh_score = scores["HH"] // 2
+    hc_score = scores["HC"] // 2
+    cc_score = scores["CC"] // 2
 
     # Compare computed score with the one from the CSV.
     if hh_score + hc_score + cc_score != user_score:
@@ -200,3 +234,191 @@ def check_score(state):
                               f"score {hh_score + hc_score + cc_score} is "
                               f"made up of:\n\tHH-bonds: {hh_score}\n\t"
                               f"HC-bonds: {hc_score}\n\tCC-bonds: {cc_score}")
+
+    # Report how far the score is from the best possible score of the protein.
+    if 1 < len(sequence) <= EXACT_MAX_LENGTH.get(dim, 0):
+        best_score, _ = optimum(sequence, dim)
+        check50.log(f"best possible score in {dim}D is {best_score}")
+        check50.log(f"score of {user_score} is {user_score - best_score} "
+                    f"above the best possible score")
+
+
+def optimum(sequence, dim):
+    """
+    Return the best possible score of a protein in 2D or 3D together with a
+    fold that reaches it, as found by fold_exact. The result is cached in the
+    optima folder next to the checks, keyed by the sequence and dimension, so
+    a protein is only searched once.
+    """
+    common = check50.import_checks("../common")
+    key = f"{dim}D:{sequence}"
+    digest = hashlib.sha256(key.encode()).hexdigest()
+
+    def compute():
+        score, fold = fold_exact(sequence, dim)
+
+        return {"key": key, "score": score, "fold": fold}
+
+    best = common.cached_json(os.path.join(check50.internal.check_dir or ".",
+                                           "optima", f"{digest}.json"),
+                              digest, compute)
+
+    return best["score"], best["fold"]
+
+
+def fold_exact(sequence, dim):
+    """
+    Find a fold of a protein with the best possible score in 2D or 3D with
+    branch and bound. Returns the score and the fold as the values of the
+    fold column of output.csv.
+
+    Folds that are rotations or mirrors of each other have the same score,
+    so only one of them is searched: the first move is 1, the first move
+    along the second axis is 2 and the first move along the third axis is 3.
+    A branch is cut off when its score plus the lowest score that the
+    remaining aminos can add is not below the best score found so far. An
+    amino can only bond with earlier aminos at an odd distance in the
+    sequence, with at most one bond per amino, and has at most 2 * dim - 2
+    bonds, or one more at the end of the protein.
+    """
+    n = len(sequence)
+
+    if n < 2:
+        return 0, [0] * n
+
+    moves = [1, -1, 2, -2, 3, -3][:2 * dim]
+    units = {d: tuple((d > 0) - (d < 0) if abs(d) == axis + 1 else 0
+                      for axis in range(dim)) for d in moves}
+
+    def bond_score(a, b):
+        return BOND_SCORES.get("".join(sorted(a + b, reverse=True)), 0)
+
+    # Lowest score that aminos k and up can add, by bonds with earlier aminos.
+    bounds = [0] * (n + 1)
+
+    for k in range(n - 1, -1, -1):
+        partners = sorted(bond_score(sequence[k], sequence[j])
+                          for j in range(k - 3, -1, -2))
+        bonds = 2 * dim - 1 - (k < n - 1)
+        bounds[k] = bounds[k + 1] + sum(partners[:bonds])
+
+    origin = (0,) * dim
+    occupied = {origin: 0, units[1]: 1}
+    fold = [1] + [0] * (n - 1)
+    best = [1, None]
+
+    def search(k, pos, score, second_axis, third_axis):
+        if k == n:
+            if score < best[0]:
+                best[0], best[1] = score, list(fold)
+            return
+
+        if score + bounds[k] >= best[0]:
+            return
+
+        options = []
+
+        for d in moves:
+            if (d in (-2, 3) and not second_axis) or \
+                    (d == -3 and not third_axis):
+                continue
+
+            new_pos = tuple(a + b for a, b in zip(pos, units[d]))
+
+            if new_pos in occupied:
+                continue
+
+            # Add the bonds with the non-connected neighbours.
+            gain = 0
+
+            if sequence[k] != "P":
+                for unit in units.values():
+                    j = occupied.get(tuple(a + b for a, b in
+                                           zip(new_pos, unit)), k - 1)
+
+                    if j < k - 1:
+                        gain += bond_score(sequence[k], sequence[j])
+
+            options.append((gain, d, new_pos))
+
+        # Try the moves with the best bonds first to find good folds early.
+        for gain, d, new_pos in sorted(options, key=lambda o: o[0]):
+            occupied[new_pos] = k
+            fold[k - 1] = d
+            search(k + 1, new_pos, score + gain,
+                   second_axis or abs(d) == 2, third_axis or abs(d) == 3)
+            del occupied[new_pos]
+
+        fold[k - 1] = 0
+
+    search(2, units[1], 0, False, False)
+
+    return best[0], best[1]
+
+
+def score_folds(sequence, directions):
+    """
+    Score many folds of the same protein at once. The folds are given as an
+    (n_folds, length) int8 matrix with a row per fold, in which every value
+    is the direction of the next amino like in the fold column of output.csv,
+    and the last value is 0.
+
+    Returns an array that marks which folds are valid, which are those that
+    only use the directions -3 to 3 and do not fold onto themselves, and an
+    array with the score of every fold. The score of an invalid fold is 0.
+    """
+    import numpy as np
+
+    aminos = np.array(list(sequence))
+    directions = np.asarray(directions, dtype=np.int8).reshape(-1, len(aminos))
+    n_folds, length = directions.shape
+    steps = directions[:, :-1].astype(np.int64)
+
+    valid = (np.abs(steps) <= 3).all(axis=1) & (steps != 0).all(axis=1) & \
+        (directions[:, -1] == 0)
+
+    # Walk every fold from the origin, with unit moves along the axes.
+    moves = np.zeros((7, 3), dtype=np.int64)
+    moves[[0, 1, 2, 4, 5, 6], [2, 1, 0, 0, 1, 2]] = [-1, -1, -1, 1, 1, 1]
+    pos = np.zeros((n_folds, length, 3), dtype=np.int64)
+    pos[:, 1:] = np.cumsum(moves[np.clip(steps, -3, 3) + 3], axis=1)
+
+    # Give every position a key that is unique over all folds, so a single
+    # sorted array of keys finds the aminos at any position in any fold.
+    base = 2 * length + 1
+    keys = (pos + length) @ np.array([base ** 2, base, 1]) + \
+        np.arange(n_folds)[:, None] * base ** 3
+    order = np.argsort(keys, axis=None, kind="stable")
+    sorted_keys = keys.ravel()[order]
+
+    # A fold folds onto itself if two of its aminos share a position.
+    same = sorted_keys[1:] == sorted_keys[:-1]
+    valid[order[1:][same] // length] = False
+
+    # Find the neighbour of every H and C amino in the positive direction of
+    # every axis, which counts every bond once.
+    types = {t: k for k, t in enumerate("HPC")}
+    codes = np.array([types.get(a, 1) for a in aminos])
+    table = np.zeros((3, 3), dtype=np.int64)
+
+    for bond, score in BOND_SCORES.items():
+        table[types[bond[0]], types[bond[1]]] = score
+        table[types[bond[1]], types[bond[0]]] = score
+
+    hc = np.nonzero(codes != types["P"])[0]
+    scores = np.zeros(n_folds, dtype=np.int64)
+
+    for step in [base ** 2, base, 1]:
+        found = np.searchsorted(sorted_keys, keys[:, hc] + step)
+        found = np.minimum(found, len(sorted_keys) - 1)
+        hit = sorted_keys[found] == keys[:, hc] + step
+        other = order[found] % length
+
+        # Connected aminos are neighbours without a bond.
+        hit &= np.abs(other - hc) > 1
+        bonds = table[codes[hc], codes[other]] * hit
+        scores += bonds.sum(axis=1)
+
+    scores[~valid] = 0
+
+    return valid, scores
@@ -9,14 +9,26 @@ does so by doing the following tests in this order:
     - Check if the given schema is correct for assignment 2.
     - Check if the given schema is correct for the advanced assignment.
 
+    The last two tests also report how far the costs are from the lowest
+    possible costs for the country, which are computed once per regions file
+    with scipy, if it is installed.
+
 @author: Okke van Eck
 @contact: okke.van.eck@gmail.com
 """
 
 import check50
-import pandas as pd
-import numpy as np
 import os
+from functools import lru_cache
+
+common = check50.import_checks("../common")
+
+# Costs of the send types per schema.
+LETTERS = ["A", "B", "C", "D", "E", "F", "G"]
+SCHEMAS = [[12, 26, 27, 30, 37, 39, 41],
+           [19, 20, 21, 23, 36, 37, 38],
+           [16, 17, 31, 33, 36, 56, 57],
+           [3, 34, 36, 39, 41, 43, 58]]
 
 
 @check50.check()
@@ -35,215 +47,388 @@ def check_file():
                               "an header row and a row with the country and a"
                               " score.")
 
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
+    header, columns = common.read_csv("output.csv")
 
-        # Check header for correct format.
-        if list(df) != ["id", "type"]:
-            raise check50.Failure("Expected header of the csv to be "
-                                  "'id,type'")
+    # Check header for correct format.
+    if header != ["id", "type"]:
+        raise check50.Failure("Expected header of the csv to be "
+                              "'id,type'")
 
-        # Check footer for correct format.
-        countries = ["china", "russia", "ukraine", "usa"]
-        country = df['id'].iloc[-1]
-        score_is_int = True
+    ids = columns["id"]
+    types = columns["type"]
 
-        try:
-            int(df['type'].iloc[-1])
-        except ValueError:
-            score_is_int = False
+    # Check footer for correct format.
+    countries = ["china", "russia", "ukraine", "usa"]
+    score_is_int = True
 
-        if len(df) < 1 or country not in countries or not score_is_int:
-            raise check50.Failure("Expected last row of the csv to be "
-                                  "'<country>,<schema>', for example:\n"
-                                  "\t'ukraine,1'")
+    try:
+        int(types[-1])
+    except (IndexError, ValueError):
+        score_is_int = False
 
-        # Stop checking if there are no countries in the output file.
-        if len(df) == 1:
-            return
+    if not score_is_int or ids[-1] not in countries:
+        raise check50.Failure("Expected last row of the csv to be "
+                              "'<country>,<schema>', for example:\n"
+                              "\t'ukraine,1'")
+
+    # Stop checking if there are no countries in the output file.
+    if len(ids) == 1:
+        return
+
+    # Check if specified ids are unique.
+    seen = set()
+    idxs = []
+
+    for idx, id in enumerate(ids):
+        if id in seen:
+            idxs.append(idx)
+
+        seen.add(id)
 
-        # Check if specified ids are unique.
-        dup_bools = np.array(df["id"].duplicated())
-        if True in dup_bools:
-            idxs = np.where(dup_bools == True)[0]
-            error = "Expected all ids to be unique, but found duplicate(s):\n"
+    if idxs:
+        error = "Expected all ids to be unique, but found duplicate(s):\n"
 
-            for idx in idxs:
-                error = "".join([error, f"\t'{df['id'][idx]}' \ton row "
-                                        f"{idx + 2}.\n"])
+        for idx in idxs:
+            error = "".join([error, f"\t'{ids[idx]}' \ton row {idx + 2}.\n"])
 
-            raise check50.Failure(error)
+        raise check50.Failure(error)
 
-        # Check if the values of the ids are all present.
-        with open(f"data/gen_students_data/{country}/{country}_regions.csv")\
-                as sourcefile:
-            source_df = pd.read_csv(sourcefile)
+    # Check if the values of the ids are all present.
+    country = ids[-1]
+    _, source = common.read_csv(f"data/gen_students_data/{country}/"
+                                f"{country}_regions.csv")
+    source_ids = [str(id) for id in source["id"]]
 
-            # Check if ids are in the source file.
-            id_bools = df["id"][:-1].isin(source_df["id"].values.astype(str))\
-                .values
+    # Check if ids are in the source file.
+    known = set(source_ids)
+    idxs = [idx for idx, id in enumerate(ids[:-1]) if id not in known]
 
-            if False in id_bools:
-                idxs = np.where(id_bools == False)[0]
-                error = "Invalid id(s) used. Expected to find ids in source " \
-                        "file, but found:\n"
+    if idxs:
+        error = "Invalid id(s) used. Expected to find ids in source " \
+                "file, but found:\n"
 
-                for idx in idxs:
-                    error = "".join([error, f"\t'{df['id'][idx]}' \ton row "
-                                            f"{idx + 2}\n"])
+        for idx in idxs:
+            error = "".join([error, f"\t'{ids[idx]}' \ton row {idx + 2}\n"])
 
-                raise check50.Failure(error)
+        raise check50.Failure(error)
 
-            # Check if ids from the source file are not in output.csv.
-            id_bools = source_df["id"].astype(str).isin(df["id"][:-1].values) \
-                .values
+    # Check if ids from the source file are not in output.csv.
+    used = set(ids[:-1])
+    missing = [id for id in source_ids if id not in used]
 
-            if False in id_bools:
-                idxs = np.where(id_bools == False)[0]
-                error = "Expected to find all id(s) from the source file in " \
-                        "output.csv, but did not find:\n"
+    if missing:
+        error = "Expected to find all id(s) from the source file in " \
+                "output.csv, but did not find:\n"
 
-                for idx in idxs:
-                    error = "".join([error, f"\t'{source_df['id'][idx]}'\n"])
+        for id in missing:
+            error = "".join([error, f"\t'{id}'\n"])
 
-                raise check50.Failure(error)
+        raise check50.Failure(error)
 
-        # Check if used send types are A till G.
-        type_bools = df["type"][:-1].isin(["A", "B", "C", "D", "E", "F", "G"])\
-            .values
-        if False in type_bools:
-            idxs = np.where(type_bools == False)[0]
-            error = "Invalid letter(s) used as send types. Expected 'A' till "\
-                    "'G', but found:\n"
+    # Check if used send types are A till G.
+    idxs = [idx for idx, type in enumerate(types[:-1])
+            if type not in ("A", "B", "C", "D", "E", "F", "G")]
 
-            for idx in idxs:
-                error = "".join([error, f"\t'{df['type'][idx]}' \ton row "
-                                        f"{idx + 2}\n"])
+    if idxs:
+        error = "Invalid letter(s) used as send types. Expected 'A' till "\
+                "'G', but found:\n"
 
-            raise check50.Failure(error)
+        for idx in idxs:
+            error = "".join([error, f"\t'{types[idx]}' \ton row "
+                                    f"{idx + 2}\n"])
+
+        raise check50.Failure(error)
 
 
 @check50.check(check_file)
 def check_configuration():
     """Check if the given configuration is valid."""
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
-        country = df['id'].iloc[-1]
+    _, columns = common.read_csv("output.csv")
+    ids = columns["id"][:-1]
+    types = columns["type"][:-1]
+    country = columns["id"][-1]
 
-        with open(f"data/gen_students_data/{country}/{country}_regions.csv")\
-                as sourcefile:
-            source_df = pd.read_csv(sourcefile)
+    _, source = common.read_csv(f"data/gen_students_data/{country}/"
+                                f"{country}_regions.csv")
 
-            # Create a list of neighbours for all ids and a list of used types.
-            neighbours = [n.split(",")
-                          for n in source_df["neighbours"].tolist()]
-            neighbours = [list(map(int, x)) for x in [n for n in neighbours]]
-            types = df["type"][:-1].tolist()
+    # Create a list of neighbours for all ids and a list of used types.
+    neighbours = [[int(n) for n in ns.split(",") if n]
+                  for ns in source["neighbours"]]
 
-            # Check if neighbours don't have the same send type.
-            invalid = []
+    # Check if neighbours don't have the same send type.
+    invalid = []
 
-            for i, [id, type] in enumerate(df[:-1].values):
-                for n in neighbours[int(id)]:
-                    if type == types[n]:
-                        invalid.append([i, n])
+    for i, [id, type] in enumerate(zip(ids, types)):
+        for n in neighbours[int(id)]:
+            if type == types[n]:
+                invalid.append([i, n])
 
-            if invalid:
-                error = "Found the following neighbouring regions with the " \
-                        "same send type:\n"
+    if invalid:
+        error = "Found the following neighbouring regions with the " \
+                "same send type:\n"
 
-                for i, j in invalid:
-                    error = "".join([error, f"\t'{df['id'][i]}' \tand "
-                                            f"'{df['id'][j]}' \thave the same "
-                                            f"type '{df['type'][i]}'\n"])
+        for i, j in invalid:
+            error = "".join([error, f"\t'{ids[i]}' \tand '{ids[j]}' \thave "
+                                    f"the same type '{types[i]}'\n"])
 
-                raise check50.Failure(error)
+        raise check50.Failure(error)
 
 
 @check50.check(check_configuration)
 def check_cost_assignment():
     """Check if the cost schema specified in output.csv is for assignment 2."""
-    letters = ["A", "B", "C", "D", "E", "F", "G"]
-    schema_1 = np.array([12, 26, 27, 30, 37, 39, 41])
-    schema_2 = np.array([19, 20, 21, 23, 36, 37, 38])
-    schema_3 = np.array([16, 17, 31, 33, 36, 56, 57])
-    schema_4 = np.array([3, 34, 36, 39, 41, 43, 58])
+    import numpy as np
+
+    schema_1, schema_2, schema_3, schema_4 = map(np.array, SCHEMAS)
 
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
-        types = df["type"][:-1].tolist()
-        occurrences = np.array([], dtype=int)
+    _, columns = common.read_csv("output.csv")
+    types = columns["type"][:-1]
+    occurrences = np.array([], dtype=int)
 
-        # Compute occurrences for all letters.
-        for l in letters:
-            occurrences = np.append(occurrences, types.count(l))
+    # Compute occurrences for all letters.
+    for l in LETTERS:
+        occurrences = np.append(occurrences, types.count(l))
 
-        # Compute costs for assignment 2.
-        schema_1_costs = np.multiply(schema_1, occurrences)
-        schema_2_costs = np.multiply(schema_2, occurrences)
-        schema_3_costs = np.multiply(schema_3, occurrences)
-        schema_4_costs = np.multiply(schema_4, occurrences)
-        schema_costs_assign = [sum(schema_1_costs), sum(schema_2_costs),
-                               sum(schema_3_costs), sum(schema_4_costs)]
-        min_schema = schema_costs_assign.index(min(schema_costs_assign)) + 1
+    # Compute costs for assignment 2.
+    schema_1_costs = np.multiply(schema_1, occurrences)
+    schema_2_costs = np.multiply(schema_2, occurrences)
+    schema_3_costs = np.multiply(schema_3, occurrences)
+    schema_4_costs = np.multiply(schema_4, occurrences)
+    schema_costs_assign = [sum(schema_1_costs), sum(schema_2_costs),
+                           sum(schema_3_costs), sum(schema_4_costs)]
+    min_schema = schema_costs_assign.index(min(schema_costs_assign)) + 1
 
-        # Check if the given scheme is correct for assignment 2 or advanced.
-        if int(df["type"].iloc[-1]) != min_schema:
-            error = "Specified schema in output.csv is not the one with " \
-                    "minimal costs.\n    The computed costs per schema with " \
-                    "the current configuration are:\n"
+    # Check if the given scheme is correct for assignment 2 or advanced.
+    if int(columns["type"][-1]) != min_schema:
+        error = "Specified schema in output.csv is not the one with " \
+                "minimal costs.\n    The computed costs per schema with " \
+                "the current configuration are:\n"
 
-            for i, cost in enumerate(schema_costs_assign):
-                error = "".join([error, f"\tSchema {i + 1}: {cost}\n"])
+        for i, cost in enumerate(schema_costs_assign):
+            error = "".join([error, f"\tSchema {i + 1}: {cost}\n"])
 
-            error = "".join([error, f"    Therefore, schema {min_schema} is "
-                                    "the cheapest."])
+        error = "".join([error, f"    Therefore, schema {min_schema} is "
+                                "the cheapest."])
 
-            raise check50.Failure(error)
+        raise check50.Failure(error)
+
+    report_gap(columns["id"][-1], "assignment", min(schema_costs_assign))
 
 
 @check50.check(check_configuration)
 def check_cost_advanced():
     """Check if the cost schema specified in output.csv is for the advanced
     assignment."""
-    letters = ["A", "B", "C", "D", "E", "F", "G"]
-    schema_1 = np.array([12, 26, 27, 30, 37, 39, 41])
-    schema_2 = np.array([19, 20, 21, 23, 36, 37, 38])
-    schema_3 = np.array([16, 17, 31, 33, 36, 56, 57])
-    schema_4 = np.array([3, 34, 36, 39, 41, 43, 58])
-
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
-        types = df["type"][:-1].tolist()
-        occurrences = np.array([], dtype=int)
+    import numpy as np
 
-        # Compute occurrences for all letters.
-        for l in letters:
-            occurrences = np.append(occurrences, types.count(l))
+    schema_1, schema_2, schema_3, schema_4 = map(np.array, SCHEMAS)
 
-        # Compute costs for advanced assignment.
-        schema_costs_advanced = [0, 0, 0, 0]
+    _, columns = common.read_csv("output.csv")
+    types = columns["type"][:-1]
+    occurrences = np.array([], dtype=int)
+
+    # Compute occurrences for all letters.
+    for l in LETTERS:
+        occurrences = np.append(occurrences, types.count(l))
 
-        for i, s in enumerate([schema_1, schema_2, schema_3, schema_4]):
-            for j, _ in enumerate(letters):
-                costs = s[j]
+    # Compute costs for advanced assignment.
+    schema_costs_advanced = [0, 0, 0, 0]
 
-                for _ in range(occurrences[j]):
-                    schema_costs_advanced[i] += costs
-                    costs *= 0.9
+    for i, s in enumerate([schema_1, schema_2, schema_3, schema_4]):
+        for j, _ in enumerate(LETTERS):
+            costs = s[j]
 
-        min_schema = schema_costs_advanced.index(min(schema_costs_advanced)) + 1
+            for _ in range(occurrences[j]):
+                schema_costs_advanced[i] += costs
+                costs *= 0.9
 
-        # Check if the given scheme is correct for assignment 2 or advanced.
-        if int(df["type"].iloc[-1]) != min_schema:
-            error = "Specified schema in output.csv is not the one with " \
-                    "minimal costs.\n    The computed costs per schema with " \
-                    "the current configuration are:\n"
-
-            for i, cost in enumerate(schema_costs_advanced):
-                error = "".join([error, f"\tSchema {i + 1}: {cost:.3f}\n"])
-
-            error = "".join([error, f"    Therefore, schema {min_schema} is "
-                                    "the cheapest."])
+    min_schema = schema_costs_advanced.index(min(schema_costs_advanced)) + 1
+
+    # Check if the given scheme is correct for assignment 2 or advanced.
+    if int(columns["type"][-1]) != min_schema:
+        error = "Specified schema in output.csv is not the one with " \
+                "minimal costs.\n    The computed costs per schema with " \
+                "the current configuration are:\n"
+
+        for i, cost in enumerate(schema_costs_advanced):
+            error = "".join([error, f"\tSchema {i + 1}: {cost:.3f}\n"])
+
+        error = "".join([error, f"    Therefore, schema {min_schema} is "
+                                "the cheapest."])
+
+        raise check50.Failure(error)
+
+    report_gap(columns["id"][-1], "advanced", min(schema_costs_advanced))
+
+
+def report_gap(country, model, cost):
+    """
+    Log the lowest possible costs for a country with the costs of a model,
+    which is either "assignment" or "advanced", and how far cost is above it.
+    """
+    try:
+        optima = lowest_costs(country, model)
+    except ImportError:
+        check50.log("computing the lowest possible costs needs scipy")
+        return
+
+    best = min(optima, key=lambda o: o["cost"])
+    check50.log(f"lowest possible costs for {country} are "
+                f"{best['cost']:.3f} with schema {best['schema']}")
+
+    if best["cost"]:
+        check50.log(f"costs of {cost:.3f} are "
+                    f"{cost / best['cost'] - 1:.2%} above the lowest "
+                    f"possible costs")
+
+
+def lowest_costs(country, model):
+    """
+    Return the lowest possible costs of every schema for a country, together
+    with the send types that reach them. The costs are either those of
+    "assignment" 2, in which every send type costs the same every time, or
+    of the "advanced" assignment, in which every next use of a send type is
+    10% cheaper.
+
+    The results are cached in the optima file of the country and model,
+    keyed by the hash of its regions file, and only recomputed if that
+    changed.
+    """
+    folder = f"data/gen_students_data/{country}"
+    digest = common.file_hash(f"{folder}/{country}_regions.csv")
+
+    def compute():
+        indptr, indices = read_adjacency(country)
+        optima = []
+
+        for i, weights in enumerate(SCHEMAS):
+            cost, types = min_cost_types(indptr, indices, weights,
+                                         model == "advanced")
+            optima.append({"schema": i + 1, "cost": cost,
+                           "types": "".join(types)})
+
+        return {"optima": optima}
+
+    return common.cached_json(f"{folder}/{country}_{model}_optima.json",
+                              digest, compute)["optima"]
+
+
+@lru_cache(maxsize=None)
+def read_adjacency(country):
+    """
+    Read the neighbours of the regions of a country as a CSR adjacency, in
+    which the neighbours of region i are indices[indptr[i]:indptr[i + 1]].
+    """
+    import numpy as np
+
+    _, source = common.read_csv(f"data/gen_students_data/{country}/"
+                                f"{country}_regions.csv")
+    neighbours = [[int(n) for n in ns.split(",") if n]
+                  for ns in source["neighbours"]]
+    indptr = np.cumsum([0] + [len(ns) for ns in neighbours])
+    indices = np.array([n for ns in neighbours for n in ns], dtype=np.int64)
+
+    return indptr, indices
+
+
+def max_cliques(indptr, indices):
+    """
+    Find all maximal cliques of at least two regions with Bron-Kerbosch
+    pivoting, which is fast on the planar maps of the countries.
+    """
+    neighbours = [set(indices[indptr[i]:indptr[i + 1]].tolist())
+                  for i in range(len(indptr) - 1)]
+    cliques = []
+
+    def extend(clique, candidates, excluded):
+        if not candidates and not excluded:
+            if len(clique) > 1:
+                cliques.append(sorted(clique))
+            return
 
-            raise check50.Failure(error)
+        pivot = max(candidates | excluded,
+                    key=lambda v: len(candidates & neighbours[v]))
+
+        for v in list(candidates - neighbours[pivot]):
+            extend(clique | {v}, candidates & neighbours[v],
+                   excluded & neighbours[v])
+            candidates = candidates - {v}
+            excluded = excluded | {v}
+
+    extend(set(), set(range(len(neighbours))), set())
+
+    return cliques
+
+
+def min_cost_types(indptr, indices, weights, advanced):
+    """
+    Find the send types of all regions with the lowest costs for a schema,
+    such that no neighbouring regions have the same send type. Returns the
+    costs and the send type of every region.
+
+    This is solved exactly as an integer program with the branch and bound of
+    the HiGHS solver in scipy. Variable x[i, t] tells if region i gets send
+    type t, and every maximal clique of regions can use every send type at
+    most once. For the advanced costs, variable y[t, m] tells if send type t
+    is used more than m times, which costs weights[t] * 0.9 ** m.
+    """
+    import numpy as np
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import csr_matrix
+
+    n, k = len(indptr) - 1, len(weights)
+    n_vars = n * k * (1 + advanced)
+    rows, cols, vals, lower, upper = [], [], [], [], []
+
+    def constrain(var_ids, factors, low, high):
+        rows.append(np.full(len(var_ids), len(lower)))
+        cols.append(var_ids)
+        vals.append(factors)
+        lower.append(low)
+        upper.append(high)
+
+    # Every region gets exactly one send type.
+    for i in range(n):
+        constrain(np.arange(i * k, i * k + k), np.ones(k), 1, 1)
+
+    # Regions that neighbour each other all get different send types.
+    for clique in max_cliques(indptr, indices):
+        for t in range(k):
+            constrain(np.array(clique) * k + t, np.ones(len(clique)), 0, 1)
+
+    if advanced:
+        costs = np.zeros(n_vars)
+
+        for t in range(k):
+            ys = n * k + t * n + np.arange(n)
+            costs[ys] = weights[t] * 0.9 ** np.arange(n)
+
+            # The uses of a send type count the first ys, in order.
+            constrain(np.concatenate([np.arange(n) * k + t, ys]),
+                      np.concatenate([np.ones(n), -np.ones(n)]), 0, 0)
+
+            for m in range(n - 1):
+                constrain(ys[m:m + 2], np.array([1, -1]), 0, np.inf)
+    else:
+        costs = np.tile(np.array(weights, dtype=np.float64), n)
+
+    matrix = csr_matrix((np.concatenate(vals), (np.concatenate(rows),
+                                                np.concatenate(cols))),
+                        shape=(len(lower), n_vars))
+    result = milp(costs, integrality=np.ones(n_vars), bounds=Bounds(0, 1),
+                  constraints=LinearConstraint(matrix, lower, upper),
+                  options={"mip_rel_gap": 0})
+    types = [LETTERS[t] for t in result.x[:n * k].reshape(n, k).argmax(axis=1)]
+
+    # Compute the costs from the send types like the checks do, since the
+    # objective of the solver has rounding errors.
+    cost = 0
+
+    for letter, weight in zip(LETTERS, weights):
+        for _ in range(types.count(letter)):
+            cost += weight
+
+            if advanced:
+                weight *= 0.9
+
+    return cost, types
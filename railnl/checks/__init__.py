@@ -12,10 +12,11 @@ does so by doing the following tests in this order:
 """
 
 import check50
-import pandas as pd
-import numpy as np
 import os
 import re
+from collections import Counter
+
+common = check50.import_checks("../../common")
 
 # Global to specify the maximum time in minutes per track and maximum number of
 # tracks. This global is changed in the holland and national sub-folder
@@ -41,202 +42,223 @@ def check_file():
         raise check50.Failure("Output.csv may not be empty. Provide at least "
                               "an header row and a row with a score.")
 
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile, dtype=str, keep_default_na=False)
+    header, columns = common.read_csv("output.csv")
+
+    # Check header for correct format.
+    if header != ["train", "stations"]:
+        raise check50.Failure("Expected header of the csv to be "
+                              "'train,stations'")
+
+    trains = columns["train"]
+    stations = columns["stations"]
+
+    # Check footer for correct format.
+    if len(trains) < 1 or trains[-1] != "score":
+        raise check50.Failure("Expected last row of the csv to be "
+                              "'score,<int | float>'")
+
+    try:
+        float(stations[-1])
+    except ValueError:
+        raise check50.Failure("Expected last row of the csv to be "
+                              "'score,<int | float>'")
 
-        # Check header for correct format.
-        if list(df) != ["train", "stations"]:
-            raise check50.Failure("Expected header of the csv to be "
-                                  "'train,stations'")
+    # Stop checking if there are no tracks in the output file.
+    if len(trains) == 1:
+        return
 
-        # Check footer for correct format.
-        if len(df) < 1 or df["train"].iloc[-1] != "score":
-            raise check50.Failure("Expected last row of the csv to be "
-                                  "'score,<int | float>'")
+    # Check if number of tracks does not exceed maximum.
+    if len(trains) - 1 > MAX_TRACKS:
+        raise check50.Failure(f"Output.csv contains {len(trains) - 1} tracks, "
+                              f"which exceeds the maximum of {MAX_TRACKS}.")
 
-        try:
-            float(df['stations'].iloc[-1])
-        except ValueError:
-            raise check50.Failure("Expected last row of the csv to be "
-                                  "'score,<int | float>'")
+    # Check if all train names are unique.
+    seen = set()
+    idxs = []
 
-        # Stop checking if there are no tracks in the output file.
-        if len(df) == 1:
-            return
+    for idx, train in enumerate(trains):
+        if train in seen:
+            idxs.append(idx)
 
-        # Check if number of tracks does not exceed maximum.
-        if len(df[:-1]) > MAX_TRACKS:
-            raise check50.Failure(f"Output.csv contains {len(df[:-1])} tracks, "
-                                  f"which exceeds the maximum of {MAX_TRACKS}.")
+        seen.add(train)
 
-        # Check if all train names are unique.
-        dup_bools = np.array(df["train"].duplicated())
+    if idxs:
+        error = "Expected all train names to be unique, but found " \
+                "duplicate:\n"
 
-        if True in dup_bools:
-            idxs = np.where(dup_bools == True)[0]
-            error = "Expected all train names to be unique, but found " \
-                    "duplicate:\n"
+        for idx in idxs:
+            error = "".join([error, f"\t'{trains[idx]}' \ton row "
+                                    f"{idx + 2}.\n"])
 
-            for idx in idxs:
-                error = "".join([error, f"\t'{df['train'][idx]}' \ton row "
-                                        f"{idx + 2}.\n"])
+        raise check50.Failure(error)
 
-            raise check50.Failure(error)
+    # Check if the stations are correctly formatted.
+    pattern = r"^\[.*\]+$"
+    idxs = [idx for idx, track in enumerate(stations[:-1])
+            if not re.match(pattern, track)]
 
-        # Check if the stations are correctly formatted.
-        pattern = r"^\[.*\]+$"
-        stations_bools = np.array(list(map(lambda x:
-                                           bool(re.match(pattern, x)),
-                                           df["stations"][:-1])))
+    if idxs:
+        error = "Invalid formatted list of stations found.\n    " \
+                "Expected stations with format '[<station1>, <station2>, " \
+                "..]' but found:\n"
 
-        if False in stations_bools:
-            idxs = np.where(stations_bools == False)[0]
-            error = "Invalid formatted list of stations found.\n    " \
-                    "Expected stations with format '[<station1>, <station2>, " \
-                    "..]' but found:\n"
+        for idx in idxs:
+            error = "".join([error, f"\t'{stations[idx]}' \ton "
+                                    f"row {idx + 2} \n"])
+
+        raise check50.Failure(error)
+
+    # Check if all stations in output.csv are specified in stations.csv.
+    existing_stations = set(common.read_csv("data/stations.csv")[1]["station"])
+    error = "Found the following non-existing stations:\n"
+    found_error = False
+
+    for row, track in enumerate(read_tracks(stations)):
+        for station in track:
+            if station not in existing_stations:
+                found_error = True
+                error = "".join([error, f"\t'{station}' \ton row "
+                                        f"{row + 2}.\n"])
 
-            for idx in idxs:
-                error = "".join([error, f"\t'{df['stations'][idx]}' \ton "
-                                        f"row {idx + 2} \n"])
+    if found_error:
+        raise check50.Failure(error)
 
-            raise check50.Failure(error)
 
-        # Check if all stations in output.csv are specified in stations.csv.
-        # with open(os.path.abspath("stations.csv")) as stationsfile:
-        with open(r"data/stations.csv") as stationsfile:
-            existing_stations = pd.read_csv(stationsfile)["station"]
-            loaded_stations = df["stations"][:-1].map(lambda x: x[1:-1]
-                                                      .split(", ")).values
+def read_tracks(stations):
+    """Split the stations column of output.csv into a list per track."""
+    return [track[1:-1].split(", ") for track in stations[:-1]]
 
-            error = "Found the following non-existing stations:\n"
-            found_error = False
 
-            for row, stations in enumerate(loaded_stations):
-                exist_bools = np.isin(stations, existing_stations)
-                if False in exist_bools:
-                    idxs = np.where(exist_bools == False)[0]
-                    found_error = True
+def read_connections():
+    """
+    Read the connections of the problem into a dict with the distance of
+    every connection, by both orders of its stations.
+    """
+    _, columns = common.read_csv("data/connections.csv")
+    distances = {}
 
-                    for idx in idxs:
-                        error = "".join([error, f"\t'{stations[idx]}' \ton row "
-                                                f"{row + 2}.\n"])
+    for con in zip(columns["station1"], columns["station2"],
+                   columns["distance"]):
+        distances.setdefault((con[0], con[1]), con[2])
+        distances.setdefault((con[1], con[0]), con[2])
 
-            if found_error:
-                raise check50.Failure(error)
+    return distances, len(columns["distance"])
 
 
 @check50.check(check_file)
 def check_tracks():
     """Check if the solution is valid."""
-    with open("output.csv") as csvfile, \
-            open(r"data/connections.csv") as connectionsfile:
-        df = pd.read_csv(csvfile)
-        connections = pd.read_csv(connectionsfile)
-
-        # Check if the order of stations are valid.
-        tracks = df["stations"][:-1].map(lambda x: x[1:-1].split(", ")).values
-        valid_cons = connections.iloc[:,:-1].values.tolist()
-        output_cons = []
-        errors = []
-
-        for i, track in enumerate(tracks):
-            output_cons.append([])
-
-            for j, t in enumerate(track[:-1]):
-                if [t, track[j + 1]] in valid_cons:
-                    output_cons[i].append([t, track[j + 1]])
-                elif [track[j + 1], t] in valid_cons:
-                    output_cons[i].append([track[j + 1], t])
-                else:
-                    errors.append([i, f"{t}, {track[j + 1]}"])
-
-        if errors:
-            error = "Found the following illegal connections:\n"
-
-            for row, stations in errors:
-                error = "".join([error, f"\t'{stations}'    \ton row "
-                                        f"{row + 2}.\n"])
+    _, columns = common.read_csv("output.csv")
+    distances, _ = read_connections()
+
+    # Check if the order of stations are valid.
+    tracks = read_tracks(columns["stations"])
+    errors = []
+
+    for i, track in enumerate(tracks):
+        for j, t in enumerate(track[:-1]):
+            if (t, track[j + 1]) not in distances:
+                errors.append([i, f"{t}, {track[j + 1]}"])
 
-            raise check50.Failure(error)
+    if errors:
+        error = "Found the following illegal connections:\n"
 
-        # Check if the time limit has not been exceeded.
-        errors = []
+        for row, stations in errors:
+            error = "".join([error, f"\t'{stations}'    \ton row "
+                                    f"{row + 2}.\n"])
 
-        for row, track in enumerate(output_cons):
-            time = 0
+        raise check50.Failure(error)
 
-            for con in track:
-                time += connections[(connections["station1"].isin([con[0]])) &
-                                    (connections["station2"].isin([con[1]]))] \
-                                   ["distance"].values[0]
+    # Check if the time limit has not been exceeded.
+    errors = []
 
-            if time > MAX_TIME:
-                errors.append([row, time])
+    for row, track in enumerate(tracks):
+        time = 0
 
-        if errors:
-            error = f"Found tracks that exceed the maximum time of " \
-                    f"{MAX_TIME} minutes on:\n"
+        for con in zip(track[:-1], track[1:]):
+            time += distances[con]
 
-            for row, time in errors:
-                error = "".join([error, f"\tRow {row + 2} with a time of "
-                                        f"{time} minutes\n"])
+        if time > MAX_TIME:
+            errors.append([row, time])
 
-            raise check50.Failure(error)
+    if errors:
+        error = f"Found tracks that exceed the maximum time of " \
+                f"{MAX_TIME} minutes on:\n"
+
+        for row, time in errors:
+            error = "".join([error, f"\tRow {row + 2} with a time of "
+                                    f"{time} minutes\n"])
+
+        raise check50.Failure(error)
 
 
 @check50.check(check_tracks)
 def check_score():
     """Check if solution produces score specified in output.csv."""
-    with open("output.csv") as csvfile, \
-        open(r"data/connections.csv") as connectionsfile:
-
-        df = pd.read_csv(csvfile)
-        connections = pd.read_csv(connectionsfile)
-
-        # Get all tracks in output.csv.
-        tracks = df["stations"][:-1].map(lambda x: x[1:-1].split(", ")).values
-        valid_cons = connections.iloc[:, :-1].values.tolist()
-        output_cons = []
-        tot_time = 0
-
-        for i, track in enumerate(tracks):
-            output_cons.append([])
-
-            for j, t in enumerate(track[:-1]):
-                if [t, track[j + 1]] in valid_cons:
-                    output_cons[i].append([t, track[j + 1]])
-                elif [track[j + 1], t] in valid_cons:
-                    output_cons[i].append([track[j + 1], t])
-
-        # Compute total time and the used connections.
-        used_cons = pd.DataFrame()
-
-        for row, track in enumerate(output_cons):
-            used_cons = used_cons.append(pd.DataFrame(track))
-            time = 0
-
-            for con in track:
-                time += connections[(connections["station1"].isin([con[0]])) &
-                                    (connections["station2"].isin([con[1]]))] \
-                                   ["distance"].values[0]
-
-            tot_time += time
-
-        # Drop duplicate connections and compute the fraction of used
-        # connections. Also compute the score generated by output.csv.
-        used_cons.drop_duplicates(keep="first", inplace=True, ignore_index=True)
-        perc_con_used = len(used_cons) / len(connections)
-
-        score = perc_con_used * 10000 - (len(df[:-1]) * 100 + tot_time)
-        user_score = float(df.iloc[-1]["stations"])
-
-        if score != user_score:
-            raise check50.Failure("Score in output.csv is not equal to the "
-                                  "computed score from the output.\n    "
-                                  "Computed score is calculated as:\n"
-                                  f"\tVariables:\n\t\tp: {perc_con_used}\n\t\t"
-                                  f"T: {len(df[:-1])}\n\t\tMin: {tot_time}\n\n"
-                                  f"\tK = {perc_con_used} * 10,000 - "
-                                  f"({len(df[:-1])} * 100 + {tot_time})\n"
-                                  f"\t  = {score:,}\n"
-                                  f"\tYour score: {user_score:,}")
+    _, columns = common.read_csv("output.csv")
+    distances, n_connections = read_connections()
+    tracks = read_tracks(columns["stations"])
+    report = track_report(tracks, distances, n_connections)
+    perc_con_used = report["p"]
+    tot_time = report["Min"]
+    score = report["score"]
+
+    # Log what every track adds to the score, to see which could be removed.
+    for row, track in enumerate(report["tracks"]):
+        check50.log(f"track on row {row + 2}: {track['minutes']:.1f} "
+                    f"minutes, {track['unique']} connections only on this "
+                    f"track, marginal score {track['marginal']:,.1f}")
+
+    user_score = float(columns["stations"][-1])
+
+    if score != user_score:
+        raise check50.Failure("Score in output.csv is not equal to the "
+                              "computed score from the output.\n    "
+                              "Computed score is calculated as:\n"
+                              f"\tVariables:\n\t\tp: {perc_con_used}\n\t\t"
+                              f"T: {len(tracks)}\n\t\tMin: {tot_time}\n\n"
+                              f"\tK = {perc_con_used} * 10,000 - "
+                              f"({len(tracks)} * 100 + {tot_time})\n"
+                              f"\t  = {score:,}\n"
+                              f"\tYour score: {user_score:,}")
+
+
+def track_report(tracks, distances, n_connections):
+    """
+    Compute the score of the tracks together with what every track adds to
+    it, in a single pass over the tracks. Returns a dict with the fraction of
+    used connections p, the number of tracks T, the total minutes Min and the
+    score, and a list with for every track its minutes, the number of
+    connections that no other track uses and its marginal score. That is the
+    score that is lost when the track is removed, which is negative if the
+    score goes up without it.
+    """
+    coverage = Counter()
+    track_cons = []
+    minutes = []
+
+    # Count the tracks that use every connection, and the time per track.
+    for track in tracks:
+        time = 0
+
+        for con in zip(track[:-1], track[1:]):
+            time += distances[con]
+
+        cons = {frozenset(con) for con in zip(track[:-1], track[1:])}
+        coverage.update(cons)
+        track_cons.append(cons)
+        minutes.append(time)
+
+    tot_time = sum(minutes)
+    perc_con_used = len(coverage) / n_connections
+    score = perc_con_used * 10000 - (len(tracks) * 100 + tot_time)
+    report = []
+
+    for cons, time in zip(track_cons, minutes):
+        unique = sum(coverage[con] == 1 for con in cons)
+        report.append({"minutes": time, "unique": unique,
+                       "marginal": unique / n_connections * 10000 -
+                       (100 + time)})
+
+    return {"p": perc_con_used, "T": len(tracks), "Min": tot_time,
+            "score": score, "tracks": report}
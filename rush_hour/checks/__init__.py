@@ -15,10 +15,10 @@ NOTE: This check50 does not compute the score of the solution since it is just
 """
 
 import check50
-import pandas as pd
-import numpy as np
 import os
 
+common = check50.import_checks("../../common")
+
 # Global for tracking the boards borders. This global is changed in the
 # sub-folders according to their board size.
 BOARD_SIZE = 0
@@ -39,159 +39,153 @@ def check_file():
         raise check50.Failure("Output.csv may not be empty. Provide at least "
                               "an header row.")
 
-    with open("output.csv") as csvfile:
-        df = pd.read_csv(csvfile)
+    rows = common.read_rows("output.csv")
+
+    # Check header for correct format.
+    if next(rows, []) != ["car", "move"]:
+        raise check50.Failure("Expected header of the csv to be "
+                              "'car,move'")
+
+    # Check the values of every move while reading the file, and only keep
+    # the invalid ones.
+    board_cars = set(common.read_csv("board.csv")[1]["car"])
+    inv_letters = []
+    inv_cars = []
+    inv_moves = []
+
+    for idx, row in enumerate(rows):
+        if len(row) != 2:
+            raise check50.Failure(f"Expected 2 values on every row, but "
+                                  f"found {len(row)} values on row "
+                                  f"{idx + 2}.")
 
-        # Check header for correct format.
-        if list(df) != ["car", "move"]:
-            raise check50.Failure("Expected header of the csv to be "
-                                  "'car,move'")
+        car, move = row
 
-        # Stop checking if there are no moves in the output file.
-        if len(df) == 1:
-            return
+        if not car.isalpha():
+            inv_letters.append((idx, car))
 
-        # Check if all values in the car column are of correct datatype and
-        # value.
-        car_name_bools = np.array([True if x.isalpha() else False
-                                   for x in df["car"]])
+        if car not in board_cars:
+            inv_cars.append((idx, car))
 
-        if False in car_name_bools:
-            idxs = np.where(car_name_bools == False)[0]
-            error = "Invalid letter(s) used for a car. Expected only " \
-                    "alphabets, but found:\n"
+        if not isinstance(common.convert_value(int, move), int):
+            inv_moves.append((idx, move))
 
-            for idx in idxs:
-                error = "".join([error, f"\t'{df['car'][idx]}' \ton row "
-                                        f"{idx+2}\n"])
+    # Check if all values in the car column are of correct datatype and
+    # value.
+    if inv_letters:
+        error = "Invalid letter(s) used for a car. Expected only " \
+                "alphabets, but found:\n"
 
-            raise check50.Failure(error)
+        for idx, car in inv_letters:
+            error = "".join([error, f"\t'{car}' \ton row {idx + 2}\n"])
 
-        # Check if all car letters are valid.
-        with open("board.csv") as boardfile:
-            board_df = pd.read_csv(boardfile)
-            car_exists_bools = df.car.isin(board_df.car).values
+        raise check50.Failure(error)
 
-            if False in car_exists_bools:
-                idxs = np.where(car_exists_bools == False)[0]
-                error = "Invalid letter(s) used for a car. The following " \
-                        "letters are not on the board:\n"
+    # Check if all car letters are valid.
+    if inv_cars:
+        error = "Invalid letter(s) used for a car. The following " \
+                "letters are not on the board:\n"
 
-                for idx in idxs:
-                    error = "".join([error, f"\t'{df['car'][idx]}' \ton row "
-                                            f"{idx + 2}\n"])
+        for idx, car in inv_cars:
+            error = "".join([error, f"\t'{car}' \ton row {idx + 2}\n"])
 
-                raise check50.Failure(error)
+        raise check50.Failure(error)
 
-        # Check if all values in the move column are of correct datatype and
-        # value.
-        if df["move"].dtype != "int":
-            if df["move"].dtype == "float":
-                error = "Invalid value(s) used for a move. Expected " \
-                        "only integers but floats were used."
-            else:
-                error = "Invalid value(s) used for a move. Expected, " \
-                        "integers but found:\n"
+    # Check if all values in the move column are of correct datatype and
+    # value.
+    if inv_moves:
+        if all(isinstance(common.convert_value(float, move), float)
+               for _, move in inv_moves):
+            error = "Invalid value(s) used for a move. Expected " \
+                    "only integers but floats were used."
+        else:
+            error = "Invalid value(s) used for a move. Expected, " \
+                    "integers but found:\n"
 
-                for i, item in enumerate(df['move']):
-                    try:
-                        int(item)
-                    except ValueError:
-                        error = "".join([error, f"\t'{df['move'][i]}' \ton "
-                                                f"row {i}\n"])
+            for idx, move in inv_moves:
+                error = "".join([error, f"\t'{move}' \ton "
+                                        f"row {idx + 2}\n"])
 
-            raise check50.Failure(error)
+        raise check50.Failure(error)
 
 
 @check50.check(check_file)
 def check_moves():
     """Check if the moves are valid and the red car exits."""
-    with open("output.csv") as csvfile, \
-            open("board.csv") as boardfile:
-        df = pd.read_csv(csvfile)
-        board_df = pd.read_csv(boardfile)
-
-        # Setup tracking dictionaries. Their key,value pairs are:
-        #   - Board -> (pos): car_letter.
-        #   - Car_data -> car_letter: [orientation, [coordinates]]
-        board = {}
-        car_data = {}
-
-        # Setup board.
-        for _, [car, orientation, row, col, length] in board_df.iterrows():
-            pos = [row, col]
-            car_data[car] = [orientation, []]
-
-            for _ in range(length):
-                board[tuple(pos)] = car
-                car_data[car][1].append(pos[:])
-
-                if orientation == "H":
-                    pos[0] += 1
-                else:
-                    pos[1] += 1
-
-        # Perform all moves.
-        for idx, [car, move] in df.iterrows():
-            orientation, pos = car_data[car]
-            orientation_idx = ["H", "V"].index(orientation)
-
-            if move > 0:
-                new_pos = pos[-1][:]
-            elif move < 0:
-                new_pos = pos[0][:]
-
-            new_pos[orientation_idx] += move
-
-            # Check if the new position is outside of the board.
-            if new_pos[0] > BOARD_SIZE or new_pos[0] <= 0 \
-                    or new_pos[1] > BOARD_SIZE or new_pos[1] <= 0:
-                raise check50.Failure(f"Car '{car}' moved outside of the board"
-                                      f" by performing '{car} {move}' on"
-                                      f" row {idx+2}")
-
-            # Compute the path between the new position and the current ones.
-            path = [[new_pos[0] + i, new_pos[1]] if orientation == "H" else
-                    [new_pos[0], new_pos[1] + i]
-                    for i in range(0, -move, -move//abs(move))]
-
-            # Sort path so the order is correct for performing the moves.
-            if move > 0:
-                path.sort()
-
-            # Check if all positions between the car and new_pos are free.
-            for path_pos in path:
-                if tuple(path_pos) in board:
-                    crash_car = board[tuple(path_pos)]
-                    raise check50.Failure(f"Car '{car}' moved into car "
-                                          f"'{crash_car}' by performing "
-                                          f"'{car} {move}' on row {idx+2}")
-
-            # Move car to the new location.
-            for p in pos:
-                del board[tuple(p)]
-
-            if len(path) < len(pos):
-                if move > 0:
-                    pos = pos[-len(pos) + len(path):]
-                    pos.extend(path)
-                    car_data[car][1] = pos
-                elif move < 0:
-                    pos = pos[:len(pos) - len(path)]
-                    path.extend(pos)
-                    car_data[car][1] = path
-            else:
-                # Compute new positions by taking the front or end of the path,
-                # depending on the direction of the move.
-                if move > 0:
-                    car_data[car][1] = path[-len(pos):]
-                elif move < 0:
-                    car_data[car][1] = path[:len(pos)]
-
-            for p in car_data[car][1]:
-                board[tuple(p)] = car
-
-        # Check if the red car moved to the edge of the board.
-        if car_data["X"][1][-1][0] != BOARD_SIZE:
-            raise check50.Failure("Red car did not end at the edge of the "
-                                  "board.")
+    _, board_columns = common.read_csv("board.csv")
+
+    # The board is a flat bytearray with the number of the car on every
+    # cell, or 0 if it is free, and a border of one cell around it. A cell
+    # at (row, col) is at index row * width + col. Every car is kept as the
+    # index of its first cell, its length and the step between its cells.
+    width = BOARD_SIZE + 2
+    board = bytearray(width * width)
+    cars = {}
+
+    for number, (car, orientation, row, col, length) in \
+            enumerate(zip(*board_columns.values()), start=1):
+        step = width if orientation == "H" else 1
+        cars[car] = [row * width + col, length, step]
+        board[row * width + col:row * width + col + length * step:step] = \
+            bytes([number]) * length
+
+    # Every row of board.csv has its own number, also if a car is listed
+    # twice, in which case the last one is moved and the first stays put.
+    names = [""] + list(board_columns["car"])
+
+    # Perform the moves while reading them, so the file is only read up to
+    # the first invalid move.
+    rows = common.read_rows("output.csv")
+    next(rows)
+
+    for idx, (car, move) in enumerate(rows):
+        move = int(move)
+        start, length, step = cars[car]
+
+        if move == 0:
+            raise check50.Failure(f"Car '{car}' did not move by performing "
+                                  f"'{car} {move}' on row {idx + 2}")
+
+        # Compute the cell at the far end of the move and its coordinates.
+        offset = length - 1 + move if move > 0 else move
+        new_pos = start + offset * step
+        row, col = divmod(start, width)
+
+        if step == width:
+            row += offset
+        else:
+            col += offset
+
+        # Check if the new position is outside of the board.
+        if row > BOARD_SIZE or row <= 0 or col > BOARD_SIZE or col <= 0:
+            raise check50.Failure(f"Car '{car}' moved outside of the board"
+                                  f" by performing '{car} {move}' on"
+                                  f" row {idx + 2}")
+
+        # Check if all cells between the car and new_pos are free, from the
+        # far end of a backward move like the path was always checked.
+        if move > 0:
+            path = board[start + length * step:new_pos + step:step]
+        else:
+            path = board[new_pos:start:step]
+
+        crash = next((number for number in path if number), None)
+
+        if crash is not None:
+            raise check50.Failure(f"Car '{car}' moved into car "
+                                  f"'{names[crash]}' by performing "
+                                  f"'{car} {move}' on row {idx + 2}")
+
+        # Move car to the new location.
+        number = board[start]
+        board[start:start + length * step:step] = bytes(length)
+        start += move * step
+        board[start:start + length * step:step] = bytes([number]) * length
+        cars[car][0] = start
+
+    # Check if the red car moved to the edge of the board.
+    start, length, step = cars["X"]
+
+    if (start + (length - 1) * step) // width != BOARD_SIZE:
+        raise check50.Failure("Red car did not end at the edge of the "
+                              "board.")
@@ -4,8 +4,9 @@ This file uses check50 to check the output of an SmartGrid solution. It
 does so by doing the following tests in this order:
     - Check if output.csv exits
     - Check if the file has valid values and is structured correctly
-    - Check if houses are connected properly to their batteries, with or
-      without sharing cables.
+    - Check if the houses and batteries are the ones from the district
+    - Check if the cables of every house form a walk to their battery, with
+      or without sharing cables.
     - Check if the given costs are correct, with or without sharing cables.
 
 @author: Okke van Eck
@@ -13,16 +14,28 @@ does so by doing the following tests in this order:
 """
 
 import check50
-import pandas as pd
-import numpy as np
+import json
+import csv
 import os
-import networkx as nx
+import re
+from array import array
+from functools import lru_cache
+
+common = check50.import_checks("../common")
+
+
+# Define common used variables. Coordinates are stored as int32.
+COORD_PATTERN = re.compile(r"^(\d+),(\d+)$", re.ASCII)
+MAX_COORD = 2 ** 31 - 1
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+REGISTRY_DTYPE = [("id", "i8"), ("x", "i4"), ("y", "i4"), ("value", "f8")]
 
 
 @check50.check()
 def exists():
     """Check if output.csv exists."""
     check50.exists("output.json")
+    check50.include("data/")
 
 
 @check50.check(exists)
@@ -34,445 +47,772 @@ def check_file():
                               "an header object with the district and costs, "
                               "and an object for a battery.")
 
-    with open("output.json") as jsonfile:
-        df = pd.read_json(jsonfile)
+    return load_output("output.json")
 
-        # Check if header object has the needed attributes.
-        error = "Did not find all attributes for the header object.\n" \
-                "    Expected to find 'district' and 'costs-own' or " \
-                "'costs-shared',\n    but did not find:\n"
-        found_error = False
 
-        if not np.isin(["district"], list(df)):
-            found_error = True
-            error = "".join([error, f"\t'district'\n"])
+def parse_coord(coord):
+    """Return the (x, y) of an '<int>,<int>' string or None if invalid."""
+    if type(coord) != str:
+        return None
 
-        if not np.isin(["costs-own"], list(df)) and \
-                not np.isin(["costs-shared"], list(df)):
-            found_error = True
-            error = "".join([error, f"\t'costs-own' or 'costs-shared'\n"])
+    match = COORD_PATTERN.match(coord)
+
+    if not match or max(map(int, match.groups())) > MAX_COORD:
+        return None
+
+    return int(match[1]), int(match[2])
+
+
+def is_float(value):
+    """Check if a value from output.json can be used as a float."""
+    if type(value) == bool:
+        return False
+
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+
+    return True
+
+
+def iter_objects(text):
+    """
+    Yield the objects of the top level JSON array in text one at a time, so
+    only a single battery is decoded into Python objects at once.
+    """
+    decoder = json.JSONDecoder()
+    idx = WHITESPACE.match(text).end()
+
+    if text[idx:idx + 1] != "[":
+        raise ValueError("Expected a list at the top level")
+
+    idx = WHITESPACE.match(text, idx + 1).end()
+
+    if text[idx:idx + 1] == "]":
+        return
+
+    while True:
+        obj, idx = decoder.raw_decode(text, idx)
+        yield obj
+        idx = WHITESPACE.match(text, idx).end()
+
+        if text[idx:idx + 1] == "]":
+            break
+
+        if text[idx:idx + 1] != ",":
+            raise ValueError(f"Expected ',' or ']' at position {idx}")
+
+        idx = WHITESPACE.match(text, idx + 1).end()
+
+    if WHITESPACE.match(text, idx + 1).end() != len(text):
+        raise ValueError(f"Extra data after position {idx}")
+
+
+def load_output(path):
+    """
+    Load the output.json at path in one pass and flatten it into columnar
+    arrays. All errors are collected while loading and raised in the same
+    order as the checks are described in check_file.
+
+    Returns a dict with the header values and the arrays:
+        - battery_xy, battery_capacity: per battery.
+        - house_battery, house_index, house_xy, house_output: per house, with
+          the index of its battery and its index within that battery.
+        - cable_house, cable_xy: per cable, with the index of its house.
+        - house_cables: offsets of the cables of every house in cable_xy.
+    """
+    import numpy as np
+
+    with open(path) as jsonfile:
+        text = jsonfile.read()
+
+    columns = {"battery_xy": array("i"), "battery_capacity": array("d"),
+               "house_battery": array("i"), "house_index": array("i"),
+               "house_xy": array("i"), "house_output": array("d"),
+               "cable_house": array("i"), "cable_xy": array("i"),
+               "house_cables": array("q", [0])}
+    errors = {key: [] for key in ["battery_attr", "houses_type", "house_attr",
+                                  "cables_type", "battery_loc", "capacity",
+                                  "house_loc", "output", "cable"]}
+    header = None
+
+    try:
+        for i, obj in enumerate(iter_objects(text)):
+            if type(obj) != dict:
+                raise check50.Failure("Expected output.json to be a list of "
+                                      "objects, but found:\n\t"
+                                      f"'{obj}' \tas object {i + 1}")
+
+            if header is None:
+                header = obj
+                continue
+
+            load_battery(obj, i, columns, errors)
+    except ValueError as e:
+        raise check50.Failure(f"Output.json is not valid JSON:\n\t{e}")
+
+    district, cost_label, costs = check_header(header)
+
+    # Raise the collected errors in order of importance.
+    messages = [
+        ("battery_attr", "Expected batteries to have the attributes "
+                         "'location', 'capacity' and 'houses', but did not "
+                         "find:\n"),
+        ("houses_type", "Expected houses to be lists of dictionaries, but "
+                        "found that:\n"),
+        ("house_attr", "Expected houses to have the attributes 'location', "
+                       "'output' and 'cables', but did not find:\n"),
+        ("cables_type", "Expected cables to be lists of strings, but found "
+                        "that:\n"),
+        ("battery_loc", "Expected battery coordinates to have the format "
+                        "'<int>,<int>', but found:\n"),
+        ("capacity", "Expected battery capacities to be floats, but found:\n"),
+        ("house_loc output", "Expected all house locations to have format "
+                             "'<int>,<int>' and their outputs to be floats, "
+                             "but found:\n"),
+        ("cable", "Expected all cable locations to have format "
+                  "'<int>,<int>', but found:\n")
+    ]
+
+    for keys, error in messages:
+        lines = [line for key in keys.split() for line in errors[key]]
+
+        if lines:
+            raise check50.Failure("".join([error] + lines))
+
+    grid = {"district": district, "cost_label": cost_label, "costs": costs}
+
+    for key, column in columns.items():
+        dtype = np.int64 if column.typecode == "q" else \
+            np.float64 if column.typecode == "d" else np.int32
+        grid[key] = np.frombuffer(column, dtype=dtype).copy()
+
+    for key in ["battery_xy", "house_xy", "cable_xy"]:
+        grid[key] = grid[key].reshape(-1, 2)
+
+    return grid
+
+
+def check_header(header):
+    """
+    Check the header object and return its district, cost label and costs.
+    """
+    if header is None:
+        header = {}
+
+    # Check if header object has the needed attributes.
+    error = "Did not find all attributes for the header object.\n" \
+            "    Expected to find 'district' and 'costs-own' or " \
+            "'costs-shared',\n    but did not find:\n"
+    found_error = False
+
+    if "district" not in header:
+        found_error = True
+        error = "".join([error, f"\t'district'\n"])
+
+    if "costs-own" not in header and "costs-shared" not in header:
+        found_error = True
+        error = "".join([error, f"\t'costs-own' or 'costs-shared'\n"])
+
+    if found_error:
+        raise check50.Failure(error)
+
+    if "costs-own" in header:
+        cost_label = "costs-own"
+    else:
+        cost_label = "costs-shared"
+
+    # Check if the header attributes have a values.
+    if header["district"] is None or header[cost_label] is None:
+        error = "Expected the header object attributes to have a value, " \
+                "but found:\n"
+
+        if header["district"] is None:
+            error = "".join([error, f"\t'district': \tNaN\n"])
+
+        if header[cost_label] is None:
+            error = "".join([error, f"\t'{cost_label}': \tNaN\n"])
+
+        raise check50.Failure(error)
+
+    # Check if the header attributes are ints.
+    values = []
+
+    for label in ["district", cost_label]:
+        value = header[label]
+
+        if type(value) == float and value.is_integer():
+            value = int(value)
+
+        if type(value) != int:
+            raise check50.Failure(f"Expected integer value for '{label}', "
+                                  f"but got:\n\t'{header[label]}'")
+
+        values.append(value)
+
+    district, costs = values
+
+    # Check if district is valid number.
+    if district not in [1, 2, 3]:
+        raise check50.Failure("Expected 1, 2 or 3 for 'district', but got:"
+                              f"\n\t{district}")
+
+    return district, cost_label, costs
+
+
+def load_battery(battery, i, columns, errors):
+    """
+    Validate battery i and append its values to the columns. Errors are
+    appended per type so they can be raised in order after loading.
+    """
+    missing = [a for a in ["location", "capacity", "houses"]
+               if battery.get(a) is None]
+
+    for attribute in missing:
+        errors["battery_attr"].append(f"\t'{attribute}' \tfor battery {i}\n")
+
+    if missing:
+        return
+
+    b = len(columns["battery_capacity"])
+    coord = parse_coord(battery["location"])
+
+    if coord is None:
+        errors["battery_loc"].append(f"\t'{battery['location']}' \tfor "
+                                     f"battery {i}\n")
+        coord = (0, 0)
 
-        if found_error:
-            raise check50.Failure(error)
+    columns["battery_xy"].extend(coord)
 
-        if np.isin(["costs-own"], list(df)):
-            cost_label = "costs-own"
+    if is_float(battery["capacity"]):
+        columns["battery_capacity"].append(float(battery["capacity"]))
+    else:
+        errors["capacity"].append(f"\t'{battery['capacity']}'        \tfor "
+                                  f"battery {i}\n")
+        columns["battery_capacity"].append(0.0)
+
+    if type(battery["houses"]) != list:
+        errors["houses_type"].append(f"\t'houses' is not a list for battery "
+                                     f"{i}\n")
+        return
+
+    for j, house in enumerate(battery["houses"]):
+        if type(house) != dict:
+            errors["houses_type"].append(f"\tHouse {j + 1} \tof battery {i} "
+                                         f"\tis not a dictionary\n")
+            continue
+
+        missing = [a for a in ["location", "output", "cables"]
+                   if a not in house]
+
+        for attribute in missing:
+            errors["house_attr"].append(f"\t'{attribute}' \tfor house "
+                                        f"{j + 1} of battery {i}\n")
+
+        if missing:
+            continue
+
+        h = len(columns["house_output"])
+        columns["house_battery"].append(b)
+        columns["house_index"].append(j)
+        coord = parse_coord(house["location"])
+
+        if coord is None:
+            errors["house_loc"].append(f"\t'{house['location']}' \t as "
+                                       f"location for house {j + 1} of "
+                                       f"battery {i}\n")
+            coord = (0, 0)
+
+        columns["house_xy"].extend(coord)
+
+        if is_float(house["output"]):
+            columns["house_output"].append(float(house["output"]))
         else:
-            cost_label = "costs-shared"
+            errors["output"].append(f"\t'{house['output']}'        \t as "
+                                    f"output for house {j + 1} of battery "
+                                    f"{i}\n")
+            columns["house_output"].append(0.0)
 
-        # Check if the header attributes have a values.
-        notna_bools_df = df.loc[0].notna()
-        if not notna_bools_df["district"] or not notna_bools_df[cost_label]:
-            error = "Expected the header object attributes to have a value, " \
-                    "but found:\n"
+        if type(house["cables"]) != list:
+            errors["cables_type"].append(f"\t'cables' is not a list for "
+                                         f"house {j + 1} of battery {i}\n")
+            columns["house_cables"].append(len(columns["cable_house"]))
+            continue
 
-            if not notna_bools_df["district"]:
-                error = "".join([error, f"\t'district': \tNaN\n"])
+        for k, cable in enumerate(house["cables"]):
+            if type(cable) != str:
+                errors["cables_type"].append(f"\tCable {k + 1} \tfrom house "
+                                             f"{j + 1} \tof battery {i} \tis "
+                                             f"not a string\n")
+                continue
 
-            if not notna_bools_df["cost_label"]:
-                error = "".join([error, f"\t'cost': \tNaN\n"])
+            coord = parse_coord(cable)
 
-            raise check50.Failure(error)
+            if coord is None:
+                errors["cable"].append(f"\t'{cable}' \t for cable {k + 1} "
+                                       f"from house {j + 1} of battery {i}\n")
+                continue
 
-        # Check if the header attributes are ints.
-        try:
-            district = df.loc[0]["district"].astype("Int64")
-        except AttributeError:
-            raise check50.Failure("Expected integer value for 'district', but "
-                                  f"got:\n\t'{df.loc[0]['district']}'")
+            columns["cable_house"].append(h)
+            columns["cable_xy"].extend(coord)
 
-        try:
-            df.loc[0][cost_label].astype("Int64")
-        except AttributeError:
-            raise check50.Failure(f"Expected integer value for '{cost_label}', "
-                                  f"but got:\n\t'{df.loc[0][cost_label]}'")
-
-        # Check if district is valid number.
-        if district not in [1, 2, 3]:
-            raise check50.Failure("Expected 1, 2 or 3 for 'district', but got:"
-                                  f"\n\t{district}")
-
-        # Check attributes for every battery.
-        error = f"Expected batteries to have the attributes 'location', " \
-                f"'capacity' and 'houses', but did not find:\n"
-        attributes = ["location", "capacity", "houses"]
-        missed_label = False
-
-        for i in range(1, len(df)):
-            key_bools = [df.loc[i].notna()[a] for a in attributes]
-
-            if False in key_bools:
-                idxs = np.where(np.array(key_bools) == False)[0]
-                missed_label = True
-
-                for idx in idxs:
-                    error = "".join([error, f"\t'{attributes[idx]}' \tfor "
-                                            f"battery {i}\n"])
-
-        if missed_label:
-            raise check50.Failure(error)
-
-        # Check if all houses are lists with dictionaries.
-        error = f"Expected houses to be lists of dictionaries, but found " \
-                f"that:\n"
-        found_error = False
-
-        for i in range(1, len(df)):
-            if type(df.loc[i]["houses"]) != list:
-                found_error = True
-                error = "".join([error, f"\t'houses' is not a list for battery "
-                                        f"{i}\n"])
+        columns["house_cables"].append(len(columns["cable_house"]))
+
+
+@check50.check(check_file)
+def check_district(grid):
+    """Check if the houses and batteries are the ones from the district."""
+    import numpy as np
+
+    registry = district_registry(grid["district"])
+    error = f"Expected all houses and batteries to be from district " \
+            f"{grid['district']}, but found that:\n"
+    found_error = False
+
+    # Join the submitted batteries and houses with the ones of the district
+    # on their grid cell.
+    for kind, xy, values, label in [
+            ("battery", grid["battery_xy"], grid["battery_capacity"],
+             "capacity"),
+            ("house", grid["house_xy"], grid["house_output"], "output")]:
+        table = registry[kind]
+        ids = cell_ids(xy)
+        idxs = np.searchsorted(table["id"], ids).clip(max=len(table) - 1)
+        found = table["id"][idxs] == ids
+        wrong = found & ~np.isclose(values, table["value"][idxs])
+
+        for k in np.nonzero(~found | wrong)[0]:
+            if kind == "battery":
+                name = f"Battery {k + 1}"
             else:
-                for j, house in enumerate(df.loc[i]["houses"]):
-                    if type(house) != dict:
-                        found_error = True
-                        error = "".join([error, f"\tHouse {j + 1} \tof battery "
-                                                f"{i} \tis not a dictionary\n"])
-
-        if found_error:
-            raise check50.Failure(error)
-
-        # Check attributes for every house.
-        error = f"Expected houses to have the attributes 'location', " \
-                f"'output' and 'cables', but did not find:\n"
-        attributes = ["location", "output", "cables"]
-        missed_label = False
-
-        for i in range(1, len(df)):
-            for j, house in enumerate(df.loc[i]["houses"]):
-                key_bools = [a in house for a in attributes]
-
-                if False in key_bools:
-                    idxs = np.where(np.array(key_bools) == False)[0]
-                    missed_label = True
-
-                    for idx in idxs:
-                        error = "".join([error, f"\t'{attributes[idx]}' \tfor "
-                                                f"house {j + 1} of battery "
-                                                f"{i}\n"])
-
-        if missed_label:
-            raise check50.Failure(error)
-
-        # Check if all cables are lists with strings.
-        error = f"Expected cables to be lists of strings, but found that:\n"
-        found_error = False
-
-        for i in range(1, len(df)):
-            for j, house in enumerate(df.loc[i]["houses"]):
-                if type(house["cables"]) != list:
-                    found_error = True
-                    error = "".join([error, f"\t'cables' is not a list for "
-                                            f"house {j + 1} of battery {i}\n"])
-                else:
-                    for k, cable in enumerate(house["cables"]):
-                        if type(cable) != str:
-                            found_error = True
-                            error = "".join([error, f"\tCable {k + 1} \tfrom "
-                                                    f"house {j + 1} \tof "
-                                                    f"battery {i} \tis not a "
-                                                    f"string\n"])
-
-        if found_error:
-            raise check50.Failure(error)
-
-        # Check for all batteries if the locations are in valid format.
-        loc_coords = df[1:]["location"].values
-        coord_bool = [False if False in list(map(str.isdigit, coord.split(",")))
-                      else True for coord in loc_coords]
-
-        if False in coord_bool:
-            idxs = np.where(np.array(coord_bool) == False)[0]
-            error = "Expected battery coordinates to have the format " \
-                    "'<int>,<int>', but found:\n"
-
-            for idx in idxs:
-                error = "".join([error, f"\t'{loc_coords[idx]}' \tfor battery "
-                                        f"{idx + 1}\n"])
-
-            raise check50.Failure(error)
-
-        # Check for all batteries if the capacity is a float.
-        caps = df[1:]["capacity"].values
-        caps_error = []
-
-        for i, cap in enumerate(caps):
-            try:
-                float(cap)
-            except ValueError:
-                caps_error.append(i)
-
-        if caps_error:
-            error = "Expected battery capacities to be floats, but found:\n"
-
-            for idx in caps_error:
-                error = "".join([error, f"\t'{caps[idx]}'        \tfor battery "
-                                        f"{idx + 1}\n"])
-
-            raise check50.Failure(error)
-
-        # Check location and output of all houses for all batteries.
-        error = "Expected all house locations to have format '<int>,<int>' " \
-                "and their outputs to be floats, but found:\n"
-        loc_errors = []
-        out_errors = []
-
-        for i in range(1, len(df)):
-            houses = df.loc[i]["houses"]
-
-            for j, house in enumerate(houses):
-                loc_bools = list(map(str.isdigit, house["location"].split(",")))
-
-                if False in loc_bools:
-                    loc_errors.append([i, j])
-
-                try:
-                    float(house["output"])
-                except ValueError:
-                    out_errors.append([i, j])
-
-        for battery, house in loc_errors:
-            location = df.loc[battery]["houses"][house]["location"]
-            error = "".join([error, f"\t'{location}' \t as location for house "
-                                    f"{house + 1} of battery {battery}\n"])
-
-        for battery, house in out_errors:
-            output = df.loc[battery]["houses"][house]["output"]
-            error = "".join([error, f"\t'{output}'        \t as output for "
-                                    f"house {house + 1} of battery {battery}"
-                                    f"\n"])
-
-        if loc_errors or out_errors:
-            raise check50.Failure(error)
-
-        # Check if all cables have locations in a valid format.
-        error = "Expected all cable locations to be floats, but found:\n"
-        cable_errors = []
-
-        for i in range(1, len(df)):
-            houses = df.loc[i]["houses"]
-
-            for j, house in enumerate(houses):
-                cable_bools = [False if False in list(map(str.isdigit,
-                                                          coord.split(",")))
-                               else True for coord in house["cables"]]
-
-                if False in cable_bools:
-                    idxs = np.where(np.array(cable_bools) == False)[0]
-
-                    for idx in idxs:
-                        cable_errors.append([i, j, idx])
+                name = f"House {grid['house_index'][k] + 1} of battery " \
+                       f"{grid['house_battery'][k] + 1}"
 
-        if cable_errors:
-            for battery, house, cable in cable_errors:
-                coord = df.loc[battery]["houses"][house]["cables"][cable]
-                error = "".join([error, f"\t'{coord}' \t for cable "
-                                        f"{cable + 1} from house {house + 1} "
-                                        f"of battery {battery}\n"])
+            if not found[k]:
+                error = "".join([error, f"\t{name} \tat '{coord_str(xy[k])}' "
+                                        f"\tis not a {kind} of the district"
+                                        f"\n"])
+            else:
+                error = "".join([error, f"\t{name} \thas {label} "
+                                        f"{values[k]} \tinstead of "
+                                        f"{table['value'][idxs[k]]}\n"])
 
-            raise check50.Failure(error)
+            found_error = True
 
+    if found_error:
+        raise check50.Failure(error)
 
-@check50.check(check_file)
-def check_structure():
+    return grid
+
+
+@lru_cache(maxsize=None)
+def district_registry(district):
+    """
+    Return the houses and batteries of a district as arrays sorted by grid
+    cell id, with the fields 'id', 'x', 'y' and 'value' for the output or
+    capacity. Every file is compiled once into a .npy file that is keyed by
+    the hash of the file and memory-mapped on later calls.
+    """
+    import numpy as np
+
+    registry = {}
+    arrays = None
+
+    for kind, path in zip(["house", "battery"], district_paths(district)):
+        npy_path = f"{path[:-4]}.{common.file_hash(path)[:16]}.npy"
+
+        try:
+            registry[kind] = np.load(npy_path, mmap_mode="r")
+            continue
+        except (OSError, ValueError):
+            pass
+
+        if arrays is None:
+            arrays = read_district(district)
+
+        xy, values = arrays[:2] if kind == "house" else arrays[2:]
+        table = np.zeros(len(xy), dtype=REGISTRY_DTYPE)
+        table["id"] = cell_ids(xy)
+        table["x"], table["y"] = xy.T
+        table["value"] = values
+        table.sort(order="id")
+        registry[kind] = table
+
+        try:
+            np.save(npy_path, table)
+        except OSError:
+            pass
+
+    return registry
+
+
+@check50.check(check_district)
+def check_structure(grid):
     """Check if the structured solution of output.json is correct."""
-    with open("output.json") as jsonfile:
-        df = pd.read_json(jsonfile)
-
-        # Check if the houses and batteries do not overlap.
-        battery_locs = df[1:]["location"].to_list()
-        house_locs = np.array([[battery, house["location"]]
-                              for battery, houses in enumerate(df[1:]["houses"])
-                              for house in houses])
-
-        # Check for overlap between batteries.
-        dup_bools =  pd.DataFrame(battery_locs).duplicated(keep=False).values
-
-        if True in dup_bools:
-            idxs = np.where(dup_bools == True)[0]
-            error = "Expected no overlap between batteries, but found " \
-                    "duplicate locations:\n"
-
-            for idx in idxs:
-                error = "".join([error, f"\t'{battery_locs[idx]}' \tfrom "
-                                        f"battery {idx + 1}\n"])
-            raise check50.Failure(error)
-
-        # Check for overlap between houses.
-        dup_bools = pd.DataFrame(house_locs[:,1]).duplicated(keep=False).values
-
-        if True in dup_bools:
-            idxs = np.where(dup_bools == True)[0]
-            error = "Expected no overlap between houses, but found duplicate" \
-                    "locations:\n"
-
-            for idx in idxs:
-                error = "".join([error, f"\t'{house_locs[idx][1]}' \tfrom "
-                                        f"house {idx + 1} of battery "
-                                        f"{int(house_locs[idx][0]) + 1}\n"])
-            raise check50.Failure(error)
-
-        # Check for overlap between batteries and houses.
-        battery_df = pd.DataFrame(battery_locs)
-        house_df = pd.DataFrame(house_locs[:,1])
-        battery_overlap = battery_df[0].isin(house_df[0])
-        house_overlap = house_df[0].isin(battery_df[0])
-
-        if True in battery_overlap.values or True in house_overlap.values:
-            battery_idxs = np.where(battery_overlap == True)[0]
-            house_idxs = np.where(house_overlap == True)[0]
-            error = "Expected no overlap between batteries and houses, but " \
-                    "found duplicate locations:\n"
-
-            for idx in battery_idxs:
-                error = "".join([error, f"\t'{battery_locs[idx]}' \tfrom "
-                                        f"battery {idx + 1}\n"])
-
-            for idx in house_idxs:
-                error = "".join([error, f"\t'{house_locs[idx][1]}' \tfrom "
-                                        f"house {idx + 1} of battery "
-                                        f"{int(house_locs[idx][0]) + 1}\n"])
-
-            raise check50.Failure(error)
-
-        # Check if cables connect the houses to their batteries.
-        error = "Expected all houses to connect to their battery, but found " \
-                "that:\n"
-        found_error = False
-
-        # Collect all cables if they are shared.
-        if np.isin(["costs-shared"], list(df)):
-            cables = set()
-            for i in range(1, len(df)):
-                for house in df.loc[i]["houses"]:
-                    for cable in house["cables"]:
-                        cables.add(tuple(map(int, cable.split(","))))
-
-        # Loop over all batteries.
-        for i in range(1, len(df)):
-            battery_coords = tuple(map(int, df.loc[i]["location"].split(",")))
-
-            # Check for all houses if the cables make a path to the battery.
-            for j, house in enumerate(df.loc[i]["houses"]):
-                house_coords = tuple(map(int, house["location"].split(",")))
-
-                graph = nx.Graph()
-                graph.add_nodes_from([0, 1])
-                nodes = {battery_coords: 0, house_coords: 1}
-
-                # Set booleans for checking if the house and battery have a
-                # cable.
-                battery_cable = False
-                house_cable = False
-
-                # Fetch all cables for this battery house combination if cables
-                # are not shared and check if house and batteries have cables.
-                if np.isin(["costs-own"], list(df)):
-                    for k, n in enumerate(house["cables"]):
-                        cable_coords = tuple(map(int, n.split(",")))
-                        if cable_coords == battery_coords:
-                            battery_cable = True
-                        elif cable_coords == house_coords:
-                            house_cable = True
-                        else:
-                            graph.add_node(k + 2)
-                            nodes[cable_coords] = k + 2
-
-                # Check if houses and battery have cables if cables are shared
-                # and add cables to nodes.
-                else:
-                    if battery_coords in cables:
-                        battery_cable = True
-
-                    if house_coords in cables:
-                        house_cable = True
-
-                    if battery_cable and house_cable:
-                        for k, cable in enumerate(cables):
-                            if cable != battery_coords and \
-                                    cable != house_coords:
-                                graph.add_node(k + 2)
-                                nodes[cable] = k + 2
-
-                # Create edges between neighbouring nodes.
-                for coord, id in nodes.items():
-                    cur_pos = list(coord)
-
-                    # Check neighbours by changing a specific axis.
-                    for move in [-2, -1, 1, 2]:
-                        cur_pos[abs(move) - 1] += move // abs(move)
-
-                        if tuple(cur_pos) in nodes:
-                            graph.add_edge(id, nodes[tuple(cur_pos)])
-
-                        cur_pos[abs(move) - 1] -= move // abs(move)
-
-                # Check if the house and battery have been connected.
-                if not battery_cable:
-                    error = "".join([error, f"\tBattery {i} \thas no cable "
-                                            f"cable to connect to House "
-                                            f"{j + 1}\n"])
-                    found_error = True
-
-                if not house_cable:
-                    error = "".join([error, f"\tHouse {j + 1} \tof Battery "
-                                            f"{i} \t has no outgoing"
-                                            f" cable\n"])
-                    found_error = True
-
-                # Check if there is a path between the house and the battery.
-                if battery_cable and house_cable and \
-                        not nx.has_path(graph, 0, 1):
-                    error = "".join([error, f"\tBattery {i} \tis not "
-                                            f"connected to House {j + 1}"
-                                            f"\n"])
-                    found_error = True
-
-        # Raise errors if there were any during connected check.
-        if found_error:
-            raise check50.Failure(error)
-
-        # Check if capacities are not exceeded.
-        for i in range(1, len(df)):
-            capacity = df.loc[i]["capacity"]
-            output = sum([house["output"] for house in df.loc[i]["houses"]])
-
-            if capacity - output < 0:
-                raise check50.Failure(f"Capacity of battery {i} was exceeded."
-                                      f"\n\tCapacity: \t{capacity}\n"
-                                      f"\tTotal usage: \t{output}")
+    import numpy as np
+
+    battery_xy = grid["battery_xy"]
+    house_xy = grid["house_xy"]
+    house_battery = grid["house_battery"]
+    house_index = grid["house_index"]
+
+    # Check for overlap between batteries.
+    dup_bools = duplicated(battery_xy)
+
+    if True in dup_bools:
+        idxs = np.where(dup_bools == True)[0]
+        error = "Expected no overlap between batteries, but found " \
+                "duplicate locations:\n"
+
+        for idx in idxs:
+            error = "".join([error, f"\t'{coord_str(battery_xy[idx])}' \t"
+                                    f"from battery {idx + 1}\n"])
+        raise check50.Failure(error)
+
+    # Check for overlap between houses.
+    dup_bools = duplicated(house_xy)
+
+    if True in dup_bools:
+        idxs = np.where(dup_bools == True)[0]
+        error = "Expected no overlap between houses, but found duplicate " \
+                "locations:\n"
+
+        for idx in idxs:
+            error = "".join([error, f"\t'{coord_str(house_xy[idx])}' \tfrom "
+                                    f"house {house_index[idx] + 1} of battery "
+                                    f"{house_battery[idx] + 1}\n"])
+        raise check50.Failure(error)
+
+    # Check for overlap between batteries and houses.
+    battery_overlap = duplicated(np.concatenate([battery_xy, house_xy]))
+    battery_overlap, house_overlap = np.split(battery_overlap,
+                                              [len(battery_xy)])
+
+    if True in battery_overlap or True in house_overlap:
+        error = "Expected no overlap between batteries and houses, but " \
+                "found duplicate locations:\n"
+
+        for idx in np.where(battery_overlap == True)[0]:
+            error = "".join([error, f"\t'{coord_str(battery_xy[idx])}' \t"
+                                    f"from battery {idx + 1}\n"])
+
+        for idx in np.where(house_overlap == True)[0]:
+            error = "".join([error, f"\t'{coord_str(house_xy[idx])}' \tfrom "
+                                    f"house {house_index[idx] + 1} of battery "
+                                    f"{house_battery[idx] + 1}\n"])
+
+        raise check50.Failure(error)
+
+    # Check if the cables of every house form a walk to their battery.
+    errors = walk_errors(grid)
+
+    if errors:
+        raise check50.Failure("".join(["Expected the cables of every house to "
+                                       "form a walk from the house to its "
+                                       "battery, but found that:\n"]
+                                      + errors))
+
+    # Check if capacities are not exceeded.
+    outputs = np.bincount(house_battery, weights=grid["house_output"],
+                          minlength=len(battery_xy))
+
+    for i, (capacity, output) in enumerate(zip(grid["battery_capacity"],
+                                               outputs)):
+        if capacity - output < 0:
+            raise check50.Failure(f"Capacity of battery {i + 1} was exceeded."
+                                  f"\n\tCapacity: \t{capacity}\n"
+                                  f"\tTotal usage: \t{output}")
+
+    return grid
+
+
+def coord_str(coord):
+    """Format a grid coordinate the way it is written in output.json."""
+    return f"{coord[0]},{coord[1]}"
+
+
+def cell_ids(coords):
+    """Intern the grid cells of an (n, 2) coordinate array as int64 ids."""
+    import numpy as np
+
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    return coords[:, 0] << 31 | coords[:, 1]
+
+
+def duplicated(coords):
+    """Mark all coordinates in an (n, 2) array that occur more than once."""
+    import numpy as np
+
+    _, inverse, counts = np.unique(cell_ids(coords), return_inverse=True,
+                                   return_counts=True)
+
+    return counts[inverse.ravel()] > 1
+
+
+def walk_errors(grid):
+    """
+    Check if the cables of every house form a walk over neighbouring grid
+    cells that starts at the house and ends at its battery. If cables are
+    shared, the walk may also end on a cable that is connected to the
+    battery, like a cable of another house.
+
+    Returns the error lines of all violations.
+    """
+    import numpy as np
+
+    cable_xy = grid["cable_xy"].astype(np.int64)
+    cable_house = grid["cable_house"]
+    offsets = grid["house_cables"]
+    house_battery = grid["house_battery"]
+    battery_xy = grid["battery_xy"][house_battery]
+    errors = []
+
+    # Every consecutive pair of cables of a house has to be one step apart.
+    steps = np.abs(np.diff(cable_xy, axis=0)).sum(axis=1)
+    same_house = cable_house[1:] == cable_house[:-1]
+    bad_steps = np.nonzero(same_house & (steps != 1))[0]
+
+    # Compare the first and last cable of every house with its endpoints.
+    has_cables = offsets[1:] > offsets[:-1]
+    starts = cable_xy[offsets[:-1][has_cables]]
+    ends = cable_xy[offsets[1:][has_cables] - 1]
+    bad_start = np.zeros(len(has_cables), dtype=bool)
+    bad_start[has_cables] = (starts != grid["house_xy"][has_cables]).any(1)
+    bad_end = np.zeros(len(has_cables), dtype=bool)
+    no_battery_cable = np.zeros(len(has_cables), dtype=bool)
+
+    if grid["cost_label"] == "costs-shared":
+        groups = np.zeros((len(cable_xy), 1), dtype=np.int64)
+        queries = np.zeros((len(ends), 1), dtype=np.int64)
+        _, battery_cable, connected = \
+            connect_cells(np.hstack([groups, cable_xy]),
+                          np.hstack([queries, ends]),
+                          np.hstack([queries, battery_xy[has_cables]]))
+        no_battery_cable[has_cables] = ~battery_cable
+        bad_end[has_cables] = battery_cable & ~connected
+    else:
+        bad_end[has_cables] = (ends != battery_xy[has_cables]).any(1)
+
+    for h in np.nonzero(~has_cables | bad_start | bad_end |
+                        no_battery_cable)[0]:
+        house = f"House {grid['house_index'][h] + 1} \tof battery " \
+                f"{house_battery[h] + 1}"
+
+        if not has_cables[h]:
+            errors.append(f"\t{house} \thas no cables\n")
+        if bad_start[h]:
+            errors.append(f"\t{house} \thas cables that do not start at "
+                          f"the house\n")
+        if no_battery_cable[h]:
+            errors.append(f"\tBattery {house_battery[h] + 1} \thas no cable "
+                          f"to connect to {house}\n")
+        if bad_end[h]:
+            errors.append(f"\t{house} \thas cables that do not end at or "
+                          f"connect to the battery\n")
+
+    for k in bad_steps:
+        h = cable_house[k]
+        errors.append(f"\tCable {k - offsets[h] + 1} \tand "
+                      f"{k - offsets[h] + 2} \tof house "
+                      f"{grid['house_index'][h] + 1} of battery "
+                      f"{house_battery[h] + 1} are not neighbours: "
+                      f"'{coord_str(cable_xy[k])}' to "
+                      f"'{coord_str(cable_xy[k + 1])}'\n")
+
+    return errors
+
+
+def connect_cells(cells, starts, ends):
+    """
+    Check which pairs of grid cells are connected through cables. All arrays
+    have the columns group, x and y, where cells only connect to neighbouring
+    cells of the same group. The components of the cables are labelled once
+    with a union-find, after which every pair is a lookup.
+
+    Returns boolean arrays that tell per pair if the start has a cable, if the
+    end has a cable and if both are in the same component.
+    """
+    import numpy as np
+
+    if not len(starts):
+        return np.zeros((3, 0), dtype=bool)
+
+    # Map all cells to linear ids, padded so neighbours never wrap an axis.
+    coords = np.concatenate([cells, starts, ends])
+    low = coords.min(axis=0) - [0, 1, 1]
+    dims = tuple(coords.max(axis=0) - low + [1, 2, 2])
+    ids = np.unique(np.ravel_multi_index((cells - low).T, dims))
+    parent = list(range(len(ids)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Union all cables with their neighbour along the y and x axis.
+    for step in [1, dims[2]]:
+        idxs = np.searchsorted(ids, ids + step).clip(max=len(ids) - 1)
+        hits = np.nonzero(ids[idxs] == ids + step)[0]
+
+        for a, b in zip(hits.tolist(), idxs[hits].tolist()):
+            parent[find(a)] = find(b)
+
+    labels = np.array([find(i) for i in range(len(ids))], dtype=np.int64)
+
+    # Look up the component of the start and end of every pair.
+    lookups = []
+
+    for coords in [starts, ends]:
+        query = np.ravel_multi_index((coords - low).T, dims)
+        idxs = np.searchsorted(ids, query).clip(max=max(len(ids) - 1, 0))
+        found = ids[idxs] == query if len(ids) else np.zeros(len(query), bool)
+        lookups.append((found, labels[idxs] if len(ids) else idxs))
+
+    (start_found, start_labels), (end_found, end_labels) = lookups
+    connected = start_found & end_found & (start_labels == end_labels)
+
+    return start_found, end_found, connected
 
 
 @check50.check(check_structure)
-def check_cost():
+def check_cost(grid):
     """Check if solution costs as much as specified in output.json."""
-    with open("output.json") as jsonfile:
-        df = pd.read_json(jsonfile)
-
-        # Collect all cables.
-        cables = []
-        for i in range(1, len(df)):
-            for house in df.loc[i]["houses"]:
-                cables.extend(house["cables"])
-
-        # Determine if cables may be shared and remove duplicates if so.
-        if np.isin(["costs-shared"], list(df)):
-            cables = list(set(cables))
-            cost_label = "costs-shared"
-        else:
-            cost_label = "costs-own"
-
-        cable_costs = 9 * len(cables)
-        battery_costs = 5000 * len(df[1:])
-        total_costs = cable_costs + battery_costs
-
-        if total_costs != df.loc[0][cost_label]:
-            raise check50.Failure(f"Costs in output.json is not equal to the "
-                                  f"computed costs.\n    Computed costs of "
-                                  f"{total_costs} is made up of:\n\t"
-                                  f"{len(cables)} cables: \t{len(cables)} * 9 "
-                                  f" \t= {cable_costs}\n\t{len(df[1:])} "
-                                  f"batteries: \t{len(df[1:])} * 5000 \t= "
-                                  f"{battery_costs}\n\tTotal costs: \t"
-                                  f"{cable_costs} + {battery_costs} \t= "
-                                  f"{total_costs}")
+    import numpy as np
+
+    cables = cell_ids(grid["cable_xy"])
+    cost_label = grid["cost_label"]
+
+    # Remove duplicate cables if they may be shared.
+    if cost_label == "costs-shared":
+        cables = np.unique(cables)
+
+    n_batteries = len(grid["battery_xy"])
+    cable_costs = 9 * len(cables)
+    battery_costs = 5000 * n_batteries
+    total_costs = cable_costs + battery_costs
+
+    if total_costs != grid["costs"]:
+        raise check50.Failure(f"Costs in output.json is not equal to the "
+                              f"computed costs.\n    Computed costs of "
+                              f"{total_costs} is made up of:\n\t"
+                              f"{len(cables)} cables: \t{len(cables)} * 9 "
+                              f" \t= {cable_costs}\n\t{n_batteries} "
+                              f"batteries: \t{n_batteries} * 5000 \t= "
+                              f"{battery_costs}\n\tTotal costs: \t"
+                              f"{cable_costs} + {battery_costs} \t= "
+                              f"{total_costs}")
+
+    # Report how far the costs are above the lower bound of the district. The
+    # bound only holds for solutions that connect all houses.
+    bounds = lower_bounds(grid["district"])
+
+    if len(grid["house_xy"]) != bounds["houses"]:
+        check50.log(f"no lower bound, since not all {bounds['houses']} houses "
+                    f"of district {grid['district']} are connected")
+        return
+
+    bound = 9 * bounds[cost_label.replace("costs", "cables")] + battery_costs
+    check50.log(f"lower bound for the {cost_label} of district "
+                f"{grid['district']} is {bound}")
+    check50.log(f"costs of {total_costs} are {total_costs / bound - 1:.2%} "
+                f"above the lower bound")
+
+
+def district_paths(district):
+    """Return the paths to the houses and batteries files of a district."""
+    folder = f"data/district_{district}"
+
+    return f"{folder}/district-{district}_houses.csv", \
+        f"{folder}/district-{district}_batteries.csv"
+
+
+def read_district(district):
+    """
+    Read the houses and batteries of a district. Returns the house locations
+    and outputs and the battery locations and capacities as arrays.
+    """
+    import numpy as np
+
+    houses_path, batteries_path = district_paths(district)
+
+    with open(houses_path) as housesfile:
+        rows = list(csv.reader(housesfile))[1:]
+        house_xy = np.array([row[:2] for row in rows], dtype=np.int32)
+        house_output = np.array([row[2] for row in rows], dtype=np.float64)
+
+    with open(batteries_path) as batteriesfile:
+        rows = list(csv.reader(batteriesfile))[1:]
+        battery_xy = np.array([row[0].split(",") for row in rows],
+                              dtype=np.int32)
+        battery_capacity = np.array([row[1] for row in rows],
+                                    dtype=np.float64)
+
+    return house_xy, house_output, battery_xy, battery_capacity
+
+
+@lru_cache(maxsize=None)
+def lower_bounds(district):
+    """
+    Return the lower bounds on the number of cables of a district, with and
+    without sharing, together with its number of houses. They
+    are cached in the bounds file of the district, keyed by the hash of the
+    houses and batteries files, and only recomputed if those changed.
+    """
+    import numpy as np
+
+    folder = f"data/district_{district}"
+    digest = common.file_hash(*district_paths(district))
+
+    def compute():
+        registry = district_registry(district)
+
+        return compute_bounds(np.column_stack([registry["house"]["x"],
+                                               registry["house"]["y"]]),
+                              np.column_stack([registry["battery"]["x"],
+                                               registry["battery"]["y"]]))
+
+    return common.cached_json(f"{folder}/district-{district}_bounds.json",
+                              digest, compute)
+
+
+def compute_bounds(house_xy, battery_xy):
+    """
+    Compute lower bounds on the number of cables needed to connect all houses
+    to a battery, ignoring the capacities. Using fewer of the batteries never
+    needs fewer cables, so the bounds hold for any subset of them.
+
+    Without sharing, every house needs at least a walk to its nearest battery.
+    With sharing, the cables form a Steiner forest in which all batteries can
+    be seen as one terminal. Its length is at least half the minimum spanning
+    tree on that metric, and at least half the summed distances from every
+    house to its nearest other terminal.
+    """
+    import numpy as np
+
+    house_xy = house_xy.astype(np.int64)
+    battery_xy = battery_xy.astype(np.int64)
+    dists = np.abs(house_xy[:, None] - house_xy[None]).sum(axis=2)
+    to_battery = np.abs(house_xy[:, None] - battery_xy[None]).sum(axis=2) \
+        .min(axis=1)
+
+    # Grow a minimum spanning tree with Prim from the merged batteries.
+    best = to_battery.copy()
+    done = np.zeros(len(house_xy), dtype=bool)
+    mst = 0
+
+    for _ in range(len(house_xy)):
+        i = np.argmin(np.where(done, np.iinfo(np.int64).max, best))
+        mst += best[i]
+        done[i] = True
+        best = np.minimum(best, dists[i])
+
+    np.fill_diagonal(dists, np.iinfo(np.int64).max)
+    nearest = np.minimum(dists.min(axis=1, initial=np.iinfo(np.int64).max),
+                         to_battery)
+    shared_cables = max(-(-mst // 2), -(-nearest.sum() // 2)) + 1
+    own_cables = (to_battery + 1).sum()
+
+    return {"cables-own": int(own_cables), "cables-shared": int(shared_cables),
+            "houses": len(house_xy)}